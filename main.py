@@ -1,15 +1,18 @@
 import hmac
-import json
-import openai
 import os
 import streamlit as st
-import yaml
+import threading
+import time
 
+from collections import OrderedDict
 from dotenv import load_dotenv
-from typing import Any, Callable
 from validator.api_standards_and_governance import validate_api_spec as validate_api_standards_and_governance
-from validator.models import RequestModel, Report, ResponseModel
+from validator.ingest import ingest
+from validator.jobs import DONE, FAILED, JOB_POLL_SECONDS, QUEUED, Job, Validator, get_job_queue
+from validator.llm import get_llm_backend
+from validator.models import RequestModel, Report, ReportSectionRule, ResponseModel
 from validator.openapi_standard import validate_api_spec as validate_openapi_standard
+from validator.rulebook import DEFAULT_RULEBOOK, RULEBOOKS
 
 def check_password():
     """Returns `True` if the user had the correct password."""
@@ -53,21 +56,17 @@ load_dotenv('.env')
 
 os.environ['CURL_CA_BUNDLE'] = ''  # Ensure SSL handling if needed
 
-# Function to handle AIbot interactions using ChatCompletion
+# Function to handle AIbot interactions using the chat model
 def interact_with_bot(user_input):
     messages = [
         {"role": "system", "content": "You are a helpful assistant skilled in API validation and documentation."},
         {"role": "user", "content": user_input}
     ]
 
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",  # Use the appropriate model name based on your API subscription
-        messages=messages,
-        verify=False  # Disable SSL verification
-    )
-    return response.choices[0].message['content'].strip()
+    # Through the shared pooled client of the configured LLM backend
+    return get_llm_backend().chat(messages, "gpt-3.5-turbo")
 
-def renderReportInMarkdown(report: Report):
+def renderStyles():
     st.markdown(
         """
         <style>
@@ -90,20 +89,58 @@ def renderReportInMarkdown(report: Report):
         unsafe_allow_html=True
     )
 
+def renderReportInMarkdown(report: Report):
+    renderStyles()
     st.markdown(header(report.name, 1))
     for section in report.sections:
         st.markdown(header(section.id, 3) + ' ' + section.name)
         for rule in section.rules:
-            if rule.humanReview:
-                card(rule.rule, rule.recommendation, "normal")
-            else:
-                card(rule.rule, rule.recommendation, "highlight")
+            card(rule.rule, rule.recommendation, cardStyle(rule))
+
+def renderJob(job: Job, showTiming: bool, container=st) -> None:
+    """Progress of a validation job and its report so far; rules still being evaluated say so."""
+    if job.status == FAILED:
+        container.error(f"Validation failed: {job.error}")
+        return
+    if job.status != DONE:
+        if job.total:
+            container.progress(job.completed / job.total, text=f"{job.completed} of {job.total} rules evaluated")
+        else:
+            container.info("Waiting for a worker..." if job.status == QUEUED else "Starting...")
+    if job.report is not None:
+        renderStyles()
+        container.markdown(header(job.report.name, 1))
+        for section in job.report.sections:
+            container.markdown(header(section.id, 3) + ' ' + section.name)
+            for rule in section.rules:
+                card(rule.rule, rule.recommendation or "<em>Evaluating...</em>", cardStyle(rule), container)
+    if job.response is not None:
+        for error in job.response.errors:
+            container.error(error)
+        if showTiming:
+            renderTiming(job.response, container)
+
+def renderTiming(response: ResponseModel, container=st) -> None:
+    # Only validators that call the LLM report timings
+    if response.timing is None:
+        return
+    with container.expander("Timing"):
+        st.json(response.timing)
+        rows = [
+            dict(rule.timing, section=section.id)
+            for section in response.report.sections for rule in section.rules if rule.timing
+        ]
+        if rows:
+            st.dataframe(rows, use_container_width=True)
+
+def cardStyle(rule: ReportSectionRule) -> str:
+    return "normal" if rule.humanReview else "highlight"
 
 def header(s: str, n: int) -> str:
     return '#'*n + ' ' + s
 
-def card(rule: str, recommendation: str, style: str) -> None:
-    st.markdown(
+def card(rule: str, recommendation: str, style: str, container=st) -> None:
+    container.markdown(
         f'''
         <div class="{style}">
             <h4>{rule}</h4>
@@ -112,8 +149,40 @@ def card(rule: str, recommendation: str, style: str) -> None:
         ''',
         unsafe_allow_html=True
     )
+class ResultStore:
+    """Validator results shared by every session and rerun, keyed by spec hash and validator name."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.results: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> ResponseModel:
+        with self.lock:
+            response = self.results.get(key)
+            if response is not None:
+                self.results.move_to_end(key)
+            return response
+
+    def put(self, key: tuple, response: ResponseModel) -> None:
+        with self.lock:
+            self.results[key] = response
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+
+    def invalidate(self, key: tuple) -> None:
+        with self.lock:
+            self.results.pop(key, None)
+
+@st.cache_resource
+def resultStore() -> ResultStore:
+    return ResultStore(int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "64")))
+
 class Option:
-    def __init__(self, name, validator: Callable[[Any], ResponseModel]):
+    # Validators take an optional on_result callback that is called as each rule completes,
+    # and run as background jobs (see validator.jobs.JOB_VALIDATORS)
+    def __init__(self, name, validator: Validator):
         self.name = name
         self.validator = validator
         self.checked = False
@@ -124,15 +193,23 @@ options: list[Option] = []
 options.append(Option("OpenAPI Standard", validate_openapi_standard))
 options.append(Option("API Standard and Governance", validate_api_standards_and_governance))
 
+# Set while a validation job is still running, so the page polls for its progress
+polling = False
+
 # File upload section
 uploaded_file = st.file_uploader("Upload your API Spec (JSON or YAML)", type=["json", "yaml"])
 if uploaded_file:
     # Load the file and perform validation
     try:
-        if uploaded_file.name.endswith(".json"):
-            req = RequestModel("json", json.load(uploaded_file))
-        else:
-            req = RequestModel("yaml", yaml.safe_load(uploaded_file))
+        # Parsed once per upload; the page reruns every JOB_POLL_SECONDS while a job runs
+        upload = st.session_state.get("upload")
+        if upload is None or upload[0] != uploaded_file.file_id:
+            upload = (uploaded_file.file_id, ingest(uploaded_file.getvalue(), uploaded_file.name))
+            st.session_state["upload"] = upload
+            st.session_state["jobs"] = {}
+        spec = upload[1]
+        req = RequestModel(spec.format_type, spec.api_spec)
+        st.caption(spec.summary())
 
         st.subheader("Generate report for the following:")
 
@@ -141,17 +218,44 @@ if uploaded_file:
             options[i].checked = st.checkbox(options[i].name, True)
             if options[i].checked:
                 tabNames.append(options[i].name)
+        showTiming = st.checkbox("Show timing, tokens and cost per rule", False)
+        rulebooks = RULEBOOKS.names()
+        if 1 < len(rulebooks):
+            req.rulebook = st.selectbox("Governance rulebook", rulebooks, index=rulebooks.index(DEFAULT_RULEBOOK) if DEFAULT_RULEBOOK in rulebooks else 0)
 
         if 0 < len(tabNames):
             t = st.tabs(tabNames)
-            ci = 0
-            for i in range(len(options)):
-                if options[i].checked:
-                    with t[ci]:
-                        with st.spinner('Generating report...'):
-                            response = options[ci].validator(req)
+            store = resultStore()
+            jobs = get_job_queue()
+            for tab, option in zip(t, [o for o in options if o.checked]):
+                with tab:
+                    key = (spec.spec_hash, option.name, req.rulebook)
+                    rerun = st.button("Re-run", key="rerun-" + option.name)
+                    if rerun:
+                        store.invalidate(key)
+                    response = store.get(key)
+                    if response is None:
+                        # Validations run as background jobs. The session submits once and then only
+                        # polls its job; other sessions submitting the same spec find the same job.
+                        job_ids = st.session_state["jobs"]
+                        job = None if rerun or key not in job_ids else jobs.get(job_ids[key])
+                        if job is None:
+                            job_ids[key] = jobs.submit(req, option.validator, force=rerun)
+                            job = jobs.get(job_ids[key])
+                        renderJob(job, showTiming)
+                        # Runs with errors are not kept, so Re-run or another session tries again
+                        if job.status == DONE and not job.response.errors:
+                            store.put(key, job.response)
+                        polling = polling or not job.finished
+                    else:
                         renderReportInMarkdown(response.report)
-                    ci += 1
+                        if showTiming:
+                            renderTiming(response)
 
     except Exception as e:
         st.error(f"Error processing the file: {str(e)}")
+
+if polling:
+    # Outside the try block above, since rerunning works by raising
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -1,30 +1,35 @@
 import streamlit as st
 from streamlit_chat import message as st_message  # Correct import for st_message
-from langchain.vectorstores import FAISS
-from langchain.embeddings.base import Embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.document_loaders import TextLoader
-from langchain.schema import Document
 from dotenv import load_dotenv
 import hmac
-import requests
-import pickle
 import os
+import threading
+import time
 import certifi  # Proper SSL handling with certifi
+import numpy as np
+from validator.embeddings import EMBEDDING_BACKEND, embed_query, embed_texts, embedding_model, get_local_model
+from validator.llm import get_llm_backend
+from validator.retrieval import HYBRID_CANDIDATES, BM25Index, reciprocal_rank_fusion
+from validator.scheduler import estimate_tokens
+from validator.telemetry import span
+from validator.vector_store import NativeIndexStore, fingerprint
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configuration: API Key and OpenAI API endpoint
+# Configuration: API Key and models; LLM_BACKEND selects live, recorded or fake calls and
+# EMBEDDING_BACKEND=local embeds with sentence-transformers instead of the embeddings endpoint
 API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
-OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+EMBEDDING_MODEL = embedding_model()
+CHAT_MODEL = "gpt-4-turbo"
 
 # Ensure Python uses certifi's CA bundle for SSL handling
 os.environ["REQUESTS_CA_BUNDLE"] = certifi.where()
 
 # Verify API key exists
-if not API_KEY:
+if not API_KEY and get_llm_backend().live:
     st.error("API Key not found. Please add it to the .env file.")
     st.stop()
 
@@ -50,65 +55,114 @@ def check_password():
 if not check_password():
     st.stop()
 
-class CustomOpenAIEmbeddings(Embeddings):
-    """Embedding class to fetch embeddings using direct OpenAI API call with verify=False."""
-    def embed_documents(self, texts):
-        """Embed multiple documents."""
-        headers = {
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json",
-        }
-        try:
-            response = requests.post(
-                OPENAI_EMBEDDINGS_URL,
-                json={"input": texts, "model": "text-embedding-ada-002"},
-                headers=headers,
-                verify=False  # Disable SSL verification
-            )
-            response.raise_for_status()
-            return [item["embedding"] for item in response.json().get("data", [])]
-        except requests.RequestException as e:
-            st.error(f"Embedding error: {e}")
-            return []
+def record_span(s):
+    """Keep the session's call timings for the timing panel."""
+    st.session_state.setdefault("spans", []).append(s.to_dict())
 
-    def embed_query(self, text):
-        """Embed a single query."""
-        embeddings = self.embed_documents([text])
-        return embeddings[0] if embeddings else None
+CONTENT_FOLDER = "content"
 
-@st.cache_resource(show_spinner=True)
-def init_faiss():
-    """Initialize FAISS index and load from cache if available."""
-    index_path = "faiss_index.pkl"
-    content_folder = "content"
+def content_signature():
+    """Names, sizes and modification times of the content files; cheap to compare on every turn."""
+    return tuple(sorted(
+        (e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in os.scandir(CONTENT_FOLDER) if e.is_file()
+    ))
 
-    if not os.listdir(content_folder):
+def load_chunks():
+    """Split the content files into the chunks that are indexed."""
+    if not os.listdir(CONTENT_FOLDER):
         st.error("Content folder is empty. Please add documents to 'content/' directory.")
         st.stop()
 
-    files_modified = max(
-        os.path.getmtime(os.path.join(content_folder, f))
-        for f in os.listdir(content_folder)
-    )
-
-    if os.path.exists(index_path) and os.path.getmtime(index_path) >= files_modified:
-        with open(index_path, "rb") as f:
-            return pickle.load(f)
-
-    loaders = [TextLoader(os.path.join(content_folder, f)) for f in os.listdir(content_folder)]
+    loaders = [TextLoader(os.path.join(CONTENT_FOLDER, f)) for f in sorted(os.listdir(CONTENT_FOLDER))]
     splitter = RecursiveCharacterTextSplitter(chunk_size=150, chunk_overlap=30)
-    docs = [Document(page_content=doc.page_content) for loader in loaders for doc in loader.load_and_split(splitter)]
-
-    embeddings_model = CustomOpenAIEmbeddings()
-    faiss_index = FAISS.from_documents(docs, embeddings_model)
-
-    with open(index_path, "wb") as f:
-        pickle.dump(faiss_index, f)
+    return [doc.page_content for loader in loaders for doc in loader.load_and_split(splitter)]
+
+class GuidanceIndex:
+    """The FAISS and BM25 indexes of the content, shared read-only by every session of this process.
+
+    Vectors are memory-mapped from the native index file, so worker processes share them too.
+    When the content changes a new version is built and published, and every process swaps
+    to it on its next turn.
+    """
+
+    def __init__(self):
+        self.store = NativeIndexStore()
+        self.lock = threading.Lock()
+        self.building = threading.Lock()
+        self.signature = None
+        self.version = None
+        self.current = None
+
+    def get(self):
+        """(FAISS index, chunk texts, BM25 index) of the current version, or None before one is published."""
+        signature = content_signature()
+        # One session rebuilds at a time; the others keep answering from the current version meanwhile
+        if signature != self.signature and self.building.acquire(blocking=False):
+            try:
+                # Kept as it was when publishing fails, so the next turn tries again
+                if signature != self.signature and self.publish():
+                    self.signature = signature
+            finally:
+                self.building.release()
+        version = self.store.current()
+        if version is None:
+            return None
+        with self.lock:
+            if version != self.version:
+                index, texts = self.store.load(version)
+                # Swapping the reference is atomic; searches in flight finish on the old indexes
+                self.current = (index, texts, BM25Index(texts))
+                self.version = version
+            return self.current
+
+    def search(self, query, k=5):
+        """The k chunks best matching query, fusing vector and BM25 rankings."""
+        current = self.get()
+        if current is None:
+            st.info("The guidance index is not built yet. Please try again in a moment.")
+            return []
+        index, texts, bm25 = current
+        candidates = min(k * HYBRID_CANDIDATES, len(texts))
+        if not candidates:
+            return []
+        try:
+            vector = np.asarray([embed_query(query, EMBEDDING_MODEL, on_span=record_span)], dtype="float32")
+            _, found = index.search(vector, candidates)
+            dense = [int(i) for i in found[0] if i >= 0]
+        except Exception as e:
+            # Keyword matches alone still give the chat something to work with
+            st.warning(f"Embedding error, using keyword search only: {e}")
+            dense = []
+        lexical = [i for i, _ in bm25.search(query, candidates)]
+        return [texts[i] for i in reciprocal_rank_fusion([dense, lexical], k)]
+
+    def publish(self):
+        """Builds and publishes the index of the content unless it is current; False when embedding fails."""
+        texts = load_chunks()
+        version = fingerprint(texts, EMBEDDING_MODEL)
+        if self.store.current() == version:
+            return True
+        vectors = None
+        if not self.store.has(version):
+            try:
+                # Batched and retried; chunks embedded before are served from the embedding cache
+                vectors = embed_texts(texts, EMBEDDING_MODEL, on_span=record_span)
+            except Exception as e:
+                st.error(f"Could not embed the content; the previous index stays in use: {e}")
+                return False
+        self.store.publish(version, vectors, texts)
+        return True
 
-    return faiss_index
+@st.cache_resource(show_spinner=True)
+def guidance_index():
+    """One index holder per process, shared by all sessions."""
+    if EMBEDDING_BACKEND == "local":
+        # Loaded up front so the first question does not wait for the model
+        get_local_model(EMBEDDING_MODEL)
+    return GuidanceIndex()
 
 def query_custom_model(prompt, context):
-    """Query the OpenAI chat model with user input and context."""
+    """Query the chat model with user input and context, showing the reply as it streams in."""
     messages = [
         {"role": "system", "content": (
             "You are an expert assistant that answers questions strictly using the provided context. "
@@ -117,30 +171,30 @@ def query_custom_model(prompt, context):
         {"role": "system", "content": f"Context:\n{context}"},
         {"role": "user", "content": prompt},
     ]
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
+    placeholder = st.empty()
     try:
-        response = requests.post(
-            OPENAI_CHAT_URL,
-            json={"model": "gpt-4-turbo", "messages": messages},
-            headers=headers,
-            verify=False  # Disable SSL verification
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
-    except requests.RequestException as e:
+        with span("chat", CHAT_MODEL, page="aibot") as s:
+            s.input_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            started = time.perf_counter()
+            reply = ""
+            for piece in get_llm_backend().stream_chat(messages, CHAT_MODEL):
+                if s.first_token is None:
+                    s.first_token = time.perf_counter() - started
+                reply += piece
+                placeholder.markdown(reply + "▌")
+            s.output_tokens = estimate_tokens(reply)
+        record_span(s)
+        # The finished reply joins the chat history below
+        placeholder.empty()
+        return reply.strip()
+    except Exception as e:
         st.error(f"Chat request failed: {e}")
         return "I'm sorry, I couldn't process your request."
 
 def interact_with_bot(user_input):
-    """Handle chat interaction using FAISS and custom model."""
-    if "faiss_index" not in st.session_state:
-        st.session_state.faiss_index = init_faiss()
-
-    docs = st.session_state.faiss_index.similarity_search(user_input, k=5)
-    context = "\n".join([doc.page_content for doc in docs])
+    """Handle chat interaction using hybrid retrieval and the chat model."""
+    chunks = guidance_index().search(user_input, k=5)
+    context = "\n".join(chunks)
     if not context:
         return "No relevant context found."
     return query_custom_model(user_input, context)
@@ -165,6 +219,10 @@ if user_input:
     ai_response = interact_with_bot(user_input)
     st.session_state.messages.insert(0, {"user": user_input, "bot": ai_response})
 
+# Optional timing panel of this session's chat and embedding calls
+if st.session_state.get("spans") and st.sidebar.checkbox("Show timing, tokens and cost"):
+    st.sidebar.dataframe(st.session_state.spans[-50:], use_container_width=True)
+
 # Display chat history
 for index, msg in enumerate(st.session_state.messages):
     st_message(msg["user"], is_user=True, key=f"user_{index}")
@@ -0,0 +1,166 @@
+import pytest
+
+from validator.checkers import CHECKERS, run_checker
+from validator.rulebook import get_rulebook
+
+def spec(paths=None, components=None):
+    api_spec = {"openapi": "3.0.3", "info": {"title": "Test", "version": "1"}, "paths": paths or {}}
+    if components:
+        api_spec["components"] = components
+    return api_spec
+
+def operation(**fields):
+    return dict({"responses": {"200": {"description": "OK"}}}, **fields)
+
+def query(name, **fields):
+    return dict({"name": name, "in": "query", "schema": {"type": "string"}}, **fields)
+
+def messages(result):
+    return [f.message for f in result.findings]
+
+EMPTY_SPECS = [spec(), {"openapi": "3.0.3", "info": {"title": "Test", "version": "1"}}, {"paths": None}]
+
+@pytest.mark.parametrize("name", sorted(CHECKERS))
+@pytest.mark.parametrize("api_spec", EMPTY_SPECS)
+def test_empty_spec_has_no_findings(name, api_spec):
+    assert run_checker(name, api_spec).findings == []
+
+@pytest.mark.parametrize("name", sorted(CHECKERS))
+@pytest.mark.parametrize("api_spec", [None, [], "openapi: 3.0.3"])
+def test_spec_that_is_not_a_mapping_is_undecided(name, api_spec):
+    result = run_checker(name, api_spec)
+    assert result.findings == [] and not result.decided
+
+@pytest.mark.parametrize("name", sorted(CHECKERS))
+@pytest.mark.parametrize("api_spec", [
+    {"paths": {"/a": {"get": "x", "parameters": 1}}, "components": []},
+    {"paths": {"/a": {"parameters": [None, {"$ref": 3}], "post": {"operationId": 7, "requestBody": None}}}},
+    {"paths": {200: {"get": {"responses": {200: None}}}}, "components": {"schemas": {"A": {"properties": {"b": 1, "c": {"$ref": "#/x"}}}}}},
+])
+def test_malformed_spec_does_not_raise(name, api_spec):
+    # Called directly, without the guard run_checker puts around it
+    CHECKERS[name](api_spec)
+
+def test_failing_checker_leaves_the_rule_undecided(monkeypatch):
+    def broken(api_spec):
+        raise RuntimeError("boom")
+    monkeypatch.setitem(CHECKERS, "broken", broken)
+    result = run_checker("broken", spec())
+    assert result.findings == [] and not result.decided
+
+@pytest.mark.parametrize("path, found", [
+    ("/users", False),
+    ("/user-accounts/{userId}/v1.2", False),
+    ("/userAccounts", True),
+    ("/user_accounts/{id}", True),
+    ("/Users", True),
+])
+def test_kebab_case_paths(path, found):
+    result = run_checker("kebab_case_paths", spec({path: {"get": operation()}}))
+    assert bool(result.findings) == found
+
+@pytest.mark.parametrize("parameter, found", [
+    (query("pageSize"), False),
+    (query("page_size"), True),
+    (query("PageSize"), True),
+    ({"name": "X-Request-Id", "in": "header"}, False),
+])
+def test_lower_camel_case_query_parameters(parameter, found):
+    result = run_checker("lower_camel_case_query_parameters", spec({"/users": {"get": operation(parameters=[parameter])}}))
+    assert bool(result.findings) == found
+    assert result.decided
+
+def test_lower_camel_case_query_parameters_follows_refs():
+    api_spec = spec(
+        {"/users": {"get": operation(parameters=[{"$ref": "#/components/parameters/PageSize"}])}},
+        {"parameters": {"PageSize": query("page_size")}}
+    )
+    assert messages(run_checker("lower_camel_case_query_parameters", api_spec)) == ["Query parameter 'page_size' is not lowerCamelCase."]
+
+def test_lower_camel_case_query_parameters_with_broken_ref_is_undecided():
+    api_spec = spec({"/users": {"get": operation(parameters=[{"$ref": "#/components/parameters/Missing"}])}})
+    result = run_checker("lower_camel_case_query_parameters", api_spec)
+    assert result.findings == [] and not result.decided
+
+@pytest.mark.parametrize("paths", [
+    {"/users/{nric}": {"get": operation()}},
+    {"/users/S1234567D": {"get": operation()}},
+    {"/users": {"get": operation(parameters=[query("passportNo")])}},
+    {"/users": {"get": operation(parameters=[query("id", example="T7654321A")])}},
+])
+def test_sensitive_identifiers_are_decided_when_found(paths):
+    result = run_checker("sensitive_identifiers_in_uri", spec(paths))
+    assert result.findings and result.decided
+
+def test_sensitive_identifiers_clean_spec_is_undecided():
+    paths = {"/users/{userId}": {"get": operation(parameters=[query("finish"), {"name": "nric", "in": "header"}])}}
+    result = run_checker("sensitive_identifiers_in_uri", spec(paths))
+    assert result.findings == [] and not result.decided
+
+def date_spec(schema, parameter=None):
+    parameters = [parameter] if parameter else []
+    return spec(
+        {"/users": {"get": operation(parameters=parameters)}},
+        {"schemas": {"User": {"type": "object", "properties": {"createdAt": schema}}}}
+    )
+
+@pytest.mark.parametrize("schema, found", [
+    ({"type": "string", "format": "date-time"}, False),
+    ({"type": "string", "format": "date", "example": "2024-01-31"}, False),
+    ({"type": "string", "format": "date-time", "example": "2024-01-31T09:30:00+08:00"}, False),
+    ({"type": "string", "format": "date-time", "example": "31/01/2024"}, True),
+    ({"type": "string"}, True),
+    ({"type": "integer"}, True),
+    ({"type": "boolean"}, False),
+    ({"$ref": "#/components/schemas/Timestamp"}, True),
+])
+def test_iso8601_date_time_properties(schema, found):
+    api_spec = date_spec(schema)
+    api_spec["components"]["schemas"]["Timestamp"] = {"type": "integer", "format": "int64"}
+    assert bool(run_checker("iso8601_date_time", api_spec).findings) == found
+
+@pytest.mark.parametrize("parameter, found", [
+    (query("fromDate", schema={"type": "string", "format": "date"}), False),
+    (query("fromDate"), True),
+    (query("fromDate", schema={"type": "string", "format": "date"}, example="01-02-2024"), True),
+    (query("status"), False),
+])
+def test_iso8601_date_time_parameters(parameter, found):
+    api_spec = date_spec({"type": "string", "format": "date-time"}, parameter)
+    assert bool(run_checker("iso8601_date_time", api_spec).findings) == found
+
+@pytest.mark.parametrize("item, found", [
+    ({"get": operation(operationId="listUsers"), "post": operation(operationId="createUser")}, None),
+    ({"get": operation(operationId="deleteUser")}, "operationId 'deleteUser' suggests DELETE but the method is GET."),
+    ({"put": operation(operationId="createUser")}, "operationId 'createUser' suggests POST but the method is PUT."),
+    ({"get": operation(operationId="getUser", requestBody={"content": {}})}, "GET should not take a request body."),
+])
+def test_crud_methods(item, found):
+    result = run_checker("crud_methods", spec({"/users": item}))
+    assert messages(result) == ([found] if found else [])
+    # Only a positive finding is final; everything else goes to the LLM
+    assert result.decided == bool(found)
+
+def test_crud_methods_flags_action_paths():
+    result = run_checker("crud_methods", spec({"/users/{userId}/delete": {"post": operation()}}))
+    assert messages(result) == ["Path ends in the action 'delete'; let the HTTP method express the action."]
+    assert result.decided
+
+@pytest.mark.parametrize("item", [
+    {"post": operation(summary="Update user")},
+    {"get": operation(summary="Delete the user")},
+])
+def test_crud_methods_without_operation_id_is_undecided(item):
+    result = run_checker("crud_methods", spec({"/users": item}))
+    assert result.findings == [] and not result.decided
+
+def test_crud_methods_empty_spec_is_undecided():
+    assert not run_checker("crud_methods", spec()).decided
+
+def test_rulebook_lets_checkers_decide_only_rules_they_fully_cover():
+    decisive = {rule.id: rule.checker for rule in get_rulebook().rules if rule.checker and rule.checkerDecides}
+    assert decisive == {
+        "3.2.2.1": "lower_camel_case_query_parameters",
+        "3.2.3.1": "sensitive_identifiers_in_uri",
+        "3.2.5.1": "crud_methods",
+    }
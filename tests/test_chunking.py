@@ -0,0 +1,98 @@
+import pytest
+
+from validator.cache import canonical_json
+from validator.chunking import chunk_spec, chunk_to_fit, merge_recommendations
+from validator.refs import get_resolver
+from validator.scheduler import estimate_tokens
+from validator.slicing import slice_spec
+from validator.synthetic import generate_spec
+
+def tokens(node):
+    return estimate_tokens(canonical_json(node))
+
+def extract_tokens(names):
+    return lambda chunk: tokens(slice_spec(chunk, names))
+
+def assert_covers(api_spec, chunks):
+    # Every path exactly once and in order, each chunk with the components its paths need
+    paths = [path for chunk in chunks for path in chunk["paths"]]
+    assert paths == list(api_spec["paths"])
+    for chunk in chunks:
+        assert {k: v for k, v in chunk.items() if k not in ("paths", "components")} == \
+               {k: v for k, v in api_spec.items() if k not in ("paths", "components")}
+        for path, item in chunk["paths"].items():
+            assert item is api_spec["paths"][path]
+        resolver = get_resolver(chunk)
+        assert resolver.errors() == []
+
+def test_small_spec_is_one_chunk():
+    api_spec = generate_spec(3, schemas=2)
+    assert chunk_spec(api_spec, 10 ** 6) == [api_spec]
+    assert chunk_to_fit(api_spec, 10 ** 6, tokens) == [api_spec]
+
+@pytest.mark.parametrize("api_spec", [None, [], {"paths": None}, {"paths": {"/a": {}}}])
+def test_spec_without_paths_to_split_is_one_chunk(api_spec):
+    assert chunk_to_fit(api_spec, 1, tokens) == [api_spec]
+
+@pytest.mark.parametrize("parts", [2, 5, 20])
+def test_chunks_fit_the_budget_and_cover_the_spec(parts):
+    api_spec = generate_spec(60, schemas=10)
+    budget = tokens(api_spec) // parts
+    chunks = chunk_to_fit(api_spec, budget, tokens)
+    assert len(chunks) > 1
+    assert_covers(api_spec, chunks)
+    for chunk in chunks:
+        assert tokens(chunk) <= budget or len(chunk["paths"]) == 1
+
+@pytest.mark.parametrize("names", [["operations"], ["query_parameters"], ["media_types", "responses"], ["schema_properties"]])
+def test_chunks_are_sized_on_the_rule_extract(names):
+    api_spec = generate_spec(60, schemas=10)
+    measure = extract_tokens(names)
+    budget = max(measure(api_spec) // 4, 1)
+    chunks = chunk_to_fit(api_spec, budget, measure)
+    assert_covers(api_spec, chunks)
+    for chunk in chunks:
+        assert measure(chunk) <= budget or len(chunk["paths"]) == 1
+
+def test_extract_larger_than_the_chunk_is_split_further():
+    api_spec = generate_spec(40, schemas=5)
+    budget = tokens(api_spec) // 2
+    plain = chunk_to_fit(api_spec, budget, tokens)
+    doubled = chunk_to_fit(api_spec, budget, lambda chunk: 2 * tokens(chunk))
+    assert len(doubled) > len(plain)
+    assert_covers(api_spec, doubled)
+
+def test_single_path_over_the_budget_is_kept_whole():
+    api_spec = generate_spec(4, schemas=4)
+    chunks = chunk_to_fit(api_spec, 1, tokens)
+    assert [list(chunk["paths"]) for chunk in chunks] == [[path] for path in api_spec["paths"]]
+    assert_covers(api_spec, chunks)
+
+@pytest.mark.parametrize("recommendation", [
+    "<p>Compliant.</p>",
+    "<p>Issues:</p><table><tr><th>Path</th><th>Problem</th></tr><tr><td>/a</td><td>snake_case</td></tr></table>",
+    "<ul><li>A<ul><li>B</li><li>C</li></ul></li><li>D</li></ul>",
+    "<h3>Summary</h3><p>Two issues.</p><ol><li>First</li><li>Second</li></ol><pre>GET /a</pre>",
+    "Plain text without markup.",
+])
+def test_merging_one_recommendation_keeps_it(recommendation):
+    assert merge_recommendations([recommendation]) == recommendation
+
+def test_merge_keeps_tables_and_text():
+    merged = merge_recommendations(["<p>Issues:</p><table><tr><td>/a</td></tr></table>", "Also check /b."])
+    assert merged == "<p>Issues:</p><table><tr><td>/a</td></tr></table>Also check /b."
+
+def test_merge_drops_repeated_points_and_joins_lists():
+    merged = merge_recommendations([
+        "<p>Non-compliant.</p><ul><li>Rename <code>/a_b</code>.</li><li>Use UTF-8.</li></ul>",
+        "<p>Non-compliant.</p>\n<ul>\n  <li>use utf-8.</li>\n  <li>Rename <code>/c_d</code>.</li>\n</ul>\n",
+    ])
+    assert merged == "<p>Non-compliant.</p><ul><li>Rename <code>/a_b</code>.</li><li>Use UTF-8.</li><li>Rename <code>/c_d</code>.</li></ul>"
+
+def test_merge_keeps_nested_lists_intact():
+    merged = merge_recommendations(["<ul><li>A<ul><li>B</li><li>C</li></ul></li></ul>", "<ul><li>D</li></ul>"])
+    assert merged == "<ul><li>A<ul><li>B</li><li>C</li></ul></li><li>D</li></ul>"
+
+def test_merge_handles_unclosed_and_stray_tags():
+    merged = merge_recommendations(["<ul><li>A<li>B</ul>", "<li>b</li>", "<p>Open", "tail</b>"])
+    assert merged == "<p>Opentail</b><ul><li>A<li>B</ul>"
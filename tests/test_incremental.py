@@ -0,0 +1,118 @@
+import pytest
+
+from validator.incremental import TooManyChanges, diff_pointers, is_affected, normalize
+from validator.slicing import SLICERS, slice_spec
+
+def base_spec():
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "Users", "version": "1"},
+        "paths": {
+            "/users": {
+                "get": {
+                    "operationId": "listUsers",
+                    "parameters": [{"$ref": "#/components/parameters/PageSize"}],
+                    "responses": {"200": {"$ref": "#/components/responses/Users"}},
+                },
+                "post": {
+                    "operationId": "createUser",
+                    "requestBody": {"$ref": "#/components/requestBodies/User"},
+                    "responses": {"201": {"description": "Created"}},
+                },
+            },
+        },
+        "components": {
+            "parameters": {"PageSize": {"name": "pageSize", "in": "query", "schema": {"$ref": "#/components/schemas/Size"}}},
+            "schemas": {
+                "Size": {"type": "integer"},
+                "User": {"type": "object", "properties": {"id": {"type": "string"}, "profile": {"$ref": "#/components/schemas/Profile"}}},
+                "Profile": {"type": "object", "properties": {"createdAt": {"type": "string", "format": "date-time"}}},
+            },
+            "requestBodies": {"User": {"content": {
+                "application/json": {"schema": {"$ref": "#/components/schemas/User"}},
+                "multipart/form-data": {"encoding": {"photo": {"headers": {"X-Rate": {"$ref": "#/components/headers/Rate"}}}}},
+            }}},
+            "headers": {"Rate": {"schema": {"type": "integer"}}},
+            "responses": {"Users": {"description": "OK", "content": {"application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/User"}}}}}},
+        },
+    }
+
+def edited(edit):
+    new = base_spec()
+    edit(new)
+    return new
+
+def test_identical_specs_have_no_changes():
+    assert diff_pointers(base_spec(), base_spec()) == set()
+    assert not is_affected(set(), list(SLICERS))
+
+def test_changed_leaf_is_reported_without_its_ancestors():
+    new = edited(lambda s: s["info"].update(title="People"))
+    assert diff_pointers(base_spec(), new) == {("info", "title")}
+
+def test_added_subtree_reports_every_node():
+    new = edited(lambda s: s["paths"].update({"/groups": {"get": {"operationId": "listGroups"}}}))
+    assert diff_pointers(base_spec(), new) == {("paths", "/groups"), ("paths", "/groups", "get"), ("paths", "/groups", "get", "operationId")}
+
+def test_list_of_another_length_is_replaced_whole():
+    new = edited(lambda s: s["paths"]["/users"]["get"]["parameters"].append({"name": "q", "in": "query"}))
+    changes = diff_pointers(base_spec(), new)
+    assert ("paths", "/users", "get", "parameters") in changes
+    assert ("paths", "/users", "get", "parameters", "1", "name") in changes
+
+def test_yaml_int_keys_compare_equal_to_their_json_view():
+    old = normalize({"paths": {"/a": {"get": {"responses": {"200": {"description": "OK"}}}}}})
+    assert diff_pointers(old, normalize({"paths": {"/a": {"get": {"responses": {200: {"description": "OK"}}}}}})) == set()
+
+def test_too_many_changes(monkeypatch):
+    monkeypatch.setattr("validator.incremental.MAX_TRACKED_CHANGES", 3)
+    with pytest.raises(TooManyChanges):
+        diff_pointers({}, {"a": {"b": {"c": {"d": 1}}}})
+
+def test_whole_spec_rules_are_affected_by_any_change():
+    changes = diff_pointers(base_spec(), edited(lambda s: s["info"].update(version="2")))
+    assert is_affected(changes, [])
+    assert is_affected(changes, ["full"])
+    assert not is_affected(changes, ["path_keys", "operations", "query_parameters"])
+
+# Each edit reaches the part of the spec a slice reads only through a $ref
+REF_EDITS = {
+    "referenced parameter renamed": lambda s: s["components"]["parameters"]["PageSize"].update(name="page_size"),
+    "schema of a referenced parameter": lambda s: s["components"]["schemas"]["Size"].update(type="string"),
+    "property of a schema behind two refs": lambda s: s["components"]["schemas"]["Profile"]["properties"]["createdAt"].pop("format"),
+    "media type of a referenced request body": lambda s: s["components"]["requestBodies"]["User"].update(content={"application/xml": {}}),
+    "referenced response": lambda s: s["components"]["responses"]["Users"].update(description="Users"),
+    "header behind a referenced encoding": lambda s: s["components"]["headers"]["Rate"].update(description="Calls left"),
+}
+
+@pytest.mark.parametrize("edit, slices", [
+    ("referenced parameter renamed", ["query_parameters", "header_parameters"]),
+    ("schema of a referenced parameter", ["query_parameters"]),
+    ("property of a schema behind two refs", ["schema_properties"]),
+    ("media type of a referenced request body", ["media_types"]),
+    ("referenced response", ["responses"]),
+    ("header behind a referenced encoding", ["media_types"]),
+])
+def test_ref_indirected_change_affects_the_slices_reading_it(edit, slices):
+    old, new = base_spec(), edited(REF_EDITS[edit])
+    changes = diff_pointers(old, new)
+    for name in slices:
+        assert is_affected(changes, [name], new), name
+
+@pytest.mark.parametrize("edit", sorted(REF_EDITS))
+def test_ref_indirected_change_leaves_unrelated_slices_alone(edit):
+    new = edited(REF_EDITS[edit])
+    assert not is_affected(diff_pointers(base_spec(), new), ["info", "path_keys", "operations", "security_schemes"], new)
+
+def test_change_to_an_unreferenced_component_leaves_the_slices_alone():
+    new = edited(lambda s: s["components"]["headers"].update(Unused={"schema": {"type": "string"}}))
+    assert not is_affected(diff_pointers(base_spec(), new), ["media_types", "operations"], new)
+
+@pytest.mark.parametrize("edit", sorted(REF_EDITS))
+def test_every_slice_whose_prompt_extract_changes_is_affected(edit):
+    # Carrying a verdict over is only safe when what the rule was shown is unchanged
+    old, new = base_spec(), edited(REF_EDITS[edit])
+    changes = diff_pointers(old, new)
+    for name in SLICERS:
+        if slice_spec(old, [name]) != slice_spec(new, [name]):
+            assert is_affected(changes, [name], new), name
@@ -1,114 +1,393 @@
 import asyncio
+import hashlib
+import json
 import os
-import yaml
+import time
+from typing import AsyncIterator
 
 from dotenv import load_dotenv
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
 
-from .models import RequestModel, ReportSectionRule, ReportSection, Report, ResponseModel
+from .cache import canonical_json, get_verdict_cache, spec_hash, verdict_key
+from .checkers import run_checker
+from .chunking import CHUNK_HEADROOM_TOKENS, PROMPT_TOKEN_BUDGET, chunk_to_fit, merge_recommendations
+from .llm import get_llm_backend
+from .incremental import Revision, TooManyChanges, diff_pointers, get_revision_store, is_affected, normalize, revision_key
+from .refs import resolver_scope
+from .rulebook import get_rulebook
+from .scheduler import NotEvaluatedError, estimate_tokens, get_scheduler
+from .slicing import slice_spec
+from .telemetry import Span, combine, export_spans, summarize
+from .models import RequestModel, ReportSectionRule, ReportSection, Report, ResponseModel, ResultCallback
 
 load_dotenv()
 
-class ASGSectionRule:
-    def __init__(self, id, rule: str, humanReview: bool):
-        self.rule = rule
-        self.humanReview = humanReview
+MODEL_NAME = "gpt-4o-mini"
 
-class ASGSection:
-    def __init__(self, id, name: str, rules: list[ASGSectionRule]):
-        self.id = id
-        self.name = name
-        self.rules = rules
+# Bump whenever the prompts change so cached verdicts from the old prompt are not reused
+PROMPT_VERSION = "4"
 
-class ASG:
-    def __init__(self, **entries):
-        self.__dict__.update(entries)
-    def __init__(self, name: str, sections: list[ASGSection]):
-        self.name = name
-        self.sections = sections
-
-
-
-def validate_api_spec(req:RequestModel) -> ResponseModel:
-    with open('./validator/api_standards_and_governance.yaml', 'r') as f:
-        data = yaml.safe_load(f)
-        asg = ASG(**data)
-
-    # Define the prompt
-    prompt_template: str = '''
-    Given the following OpenAPI specification:
+# Shared by every governance prompt: fixed instructions, then the spec. Only what follows differs per rule.
+PROMPT_PREFIX: str = '''
+    You review OpenAPI specifications against API standards.
+    For each standard, provide specific recommendations for addressing the gaps found, cite all the relevant information in the gap and be concise.
+    - Don't include a title.
+    - Don't include an overview
+    - Don't include a conclusion
+    - Don't include a recommendation if it is already compliant, think carefully and step-by-step
 
+    The OpenAPI specification, or the extract of it relevant to the standards, as minified JSON:
     {api_spec}
+    '''
 
+SINGLE_PROMPT_SUFFIX: str = '''
     Please analyse this specification against the following API standard "{standard_name}":
     {standard_rule}
 
-    Provide specific recommendations for addressing the gaps found, cite all the relevant information in the gap and be concise.
-    - Don't include a title.
-    - Don't include an overview
-    - Don't include a conclusion
-    - Don't include a recommendation if it is already compliant, think carefully and step-by-step
-
     Output in HTML format and remove the enclosing ```html and ```
     '''
 
-    prompt = PromptTemplate.from_template(template=prompt_template)
+BATCH_PROMPT_SUFFIX: str = '''
+    Please analyse this specification against each of the following API standards, given as [id] "name": rule:
+    {standard_rules}
+
+    Write each recommendation in HTML. Respond with a JSON object only, in the form
+    {{"verdicts": [{{"id": "<standard id>", "recommendation": "<HTML>"}}]}}
+    with exactly one verdict for every standard id listed above.
+    '''
+
+# How rules are grouped into LLM calls: "off" (one call per rule), "section" or "rulebook"
+BATCH_MODE = os.getenv("GOVERNANCE_BATCH_MODE", "section")
+
+# Output budget reserved per rule when estimating a call's token cost
+OUTPUT_TOKENS_PER_RULE = 500
+
+def validate_api_spec(req:RequestModel, on_result: ResultCallback = None) -> ResponseModel:
+    return asyncio.run(validate_api_spec_async(req, on_result))
+
+async def iter_api_spec_results(req: RequestModel) -> AsyncIterator[tuple[ReportSection, ReportSectionRule]]:
+    """Yields each rule of the report as soon as its recommendation is ready."""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run() -> ResponseModel:
+        try:
+            return await validate_api_spec_async(req, lambda report, section, rule: queue.put_nowait((section, rule)))
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    while (item := await queue.get()) is not None:
+        yield item
+    await task
+
+async def validate_api_spec_async(req:RequestModel, on_result: ResultCallback = None) -> ResponseModel:
+    # Refs are resolved once per spec for the whole validation, and forgotten after it
+    with resolver_scope():
+        return await run_validation(req, on_result)
+
+async def run_validation(req: RequestModel, on_result: ResultCallback) -> ResponseModel:
+    started = time.perf_counter()
+
+    def offload(fn, *args):
+        # Loading the rulebook, diffing, slicing, checkers and the SQLite stores are CPU or disk bound;
+        # they run on worker threads, in this validation's context, so the event loop only waits on the LLM
+        return asyncio.to_thread(fn, *args)
+
+    backend = get_llm_backend()
+    model_id = backend.model_id(MODEL_NAME)
+
+    def load_previous() -> tuple:
+        # Parsed and checked once, and again only when the file changes
+        asg = get_rulebook(req.rulebook)
+
+        # A previous revision of the same spec validated with the same model and prompt lets rules
+        # whose part of the spec did not change keep their verdicts, as long as the rule itself did not change
+        fingerprint = spec_hash({'rulebook': asg.key, 'model': model_id, 'prompt_version': PROMPT_VERSION})
+        revision = revision_key(req.api_spec, req.spec_key)
+        current_spec = normalize(req.api_spec) if revision else None
+        previous = get_revision_store().get(revision) if revision else None
+        changes = None
+        if previous is not None and previous.fingerprint == fingerprint:
+            try:
+                changes = diff_pointers(previous.api_spec, current_spec)
+            except TooManyChanges:
+                changes = None
+        return asg, fingerprint, revision, current_spec, previous, changes
+
+    asg, fingerprint, revision, current_spec, previous, changes = await offload(load_previous)
+
+    # Both prompts start with the same instructions and the same serialized spec, so the provider's
+    # prompt cache can serve that prefix to every rule that reads the same extract
+    prompt = PromptTemplate.from_template(template=PROMPT_PREFIX + SINGLE_PROMPT_SUFFIX)
 
     # Define the large language model
-    llm = ChatOpenAI(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        model="gpt-4o-mini",
-        temperature=0.1,
-        default_headers={"user-agent": "Mozilla/5.0 (X11; Linux x86_64; rv:60.0) Gecko/20100101 Firefox/81.0"},
-    )
+    llm = backend.chat_model(MODEL_NAME, temperature=0.1)
 
     # Define the output parser
     output_parser = StrOutputParser()
 
-    # Define the chain
-    chain = prompt | llm | output_parser
-
-    async def process_single_query(query: dict) -> str:
-        if query['human_review']:
-            return "This guideline requires human review and cannot be validated by software."
-        else:
-            result = await chain.ainvoke(query)
-            return result
-
-    async def process_multiple_queries(queries: list[dict]) -> list[str]:
-        tasks = [process_single_query(query) for query in queries]
-        results = await asyncio.gather(*tasks)
-        return results
-
-    queries = []
-    reportSections: list[ReportSection] = []
-    for section in asg.sections:
-        reportSectionRules: list[ReportSectionRule] = []
-        for rule in section['rules']:
-            queries.append({
-                'api_spec': req.api_spec,
-                'standard_id': section['id'],
-                'standard_name': section['name'],
-                'standard_rule': rule['rule'],
-                'human_review': rule['humanReview']
-            })
-
-            reportSectionRules.append(ReportSectionRule(
-                rule=rule['rule'],
-                humanReview=rule['humanReview'],
-                recommendation=""
-            ))
-
-        reportSections.append(ReportSection(section['id'], section['name'], reportSectionRules))
-
-    results = asyncio.run(process_multiple_queries(queries))
-
-    i = 0
-    for s in reportSections:
-        for r in s.rules:
-            r.recommendation = results[i]
-            i += 1
-
-    return ResponseModel(Report(asg.name, reportSections), [])
+    # Define the chain; the output parser is applied afterwards so the message's token usage can be read
+    chain = prompt | llm
+
+    # Batched prompt evaluating several rules in one call with one JSON verdict per rule
+    batch_prompt = PromptTemplate.from_template(template=PROMPT_PREFIX + BATCH_PROMPT_SUFFIX)
+    batch_chain = batch_prompt | llm.bind(response_format={"type": "json_object"})
+
+    cache = get_verdict_cache()
+    scheduler = get_scheduler()
+    stats = {'hits': 0, 'misses': 0}
+    errors: list[str] = []
+    failed: set[str] = set()
+
+    results: dict[str, str] = {}
+    spans: list[Span] = []
+
+    def finish(query: dict, result: str, span: Span) -> None:
+        results[query['rule_id']] = result
+        rule = query['report_rule']
+        rule.recommendation = prefix_findings(query['check'], result) if query.get('llm') else result
+        spans.append(span)
+        rule.timing = span.to_dict()
+        if on_result:
+            on_result(report, query['report_section'], rule)
+
+    def not_evaluated(query: dict, e: NotEvaluatedError, span: Span) -> str:
+        errors.append(f"Rule {query['rule_id']} was not evaluated: {e}")
+        failed.add(query['rule_id'])
+        span.error = str(e)
+        return f"<p>Not evaluated: the review of this guideline {e}. Please try again later.</p>"
+
+    async def call_llm(runnable, prompt_input: dict, tokens: int, span: Span) -> str:
+        try:
+            message = await scheduler.run(lambda: runnable.ainvoke(prompt_input), tokens, span)
+        except NotEvaluatedError:
+            raise
+        except Exception as e:
+            # Errors retrying cannot fix, e.g. a prompt over the context window, cost this rule only
+            raise NotEvaluatedError(f"failed with {type(e).__name__}: {e}") from e
+        result = output_parser.invoke(message)
+        # Provider reported usage when there is one, the scheduler's estimate otherwise
+        usage = getattr(message, 'usage_metadata', None) or {}
+        span.record_usage(
+            usage.get('input_tokens') or tokens - OUTPUT_TOKENS_PER_RULE * span.batch_size,
+            usage.get('output_tokens') or estimate_tokens(result),
+            (usage.get('input_token_details') or {}).get('cache_read') or 0
+        )
+        return result
+
+    extracts: dict[tuple, tuple] = {}
+
+    def prompt_spec(source, names) -> tuple[str, int, str]:
+        # (minified canonical JSON, estimated tokens, digest) of an extract, computed once per request
+        # however many rules or batches share it. The source is kept with it so its id cannot be reused.
+        key = (id(source), tuple(names))
+        if key not in extracts:
+            text = canonical_json(slice_spec(source, list(names)))
+            extracts[key] = (source, (text, estimate_tokens(text), hashlib.sha256(text.encode("utf-8")).hexdigest()))
+        return extracts[key][1]
+
+    chunks: dict[tuple, list] = {}
+
+    def spec_chunks(names) -> list:
+        # Sized on the extract each chunk gives the rule, once per slice, for the first rule that needs it
+        key = tuple(names)
+        if key not in chunks:
+            chunks[key] = chunk_to_fit(req.api_spec, PROMPT_TOKEN_BUDGET - CHUNK_HEADROOM_TOKENS, lambda chunk: prompt_spec(chunk, names)[1])
+        return chunks[key]
+
+    async def process_chunked_query(query: dict) -> None:
+        # Map: the rule against each chunk in parallel; reduce: one deduplicated recommendation
+        extracts_of_chunks = await offload(lambda: [prompt_spec(chunk, query['slice']) for chunk in spec_chunks(query['slice'])])
+        parts = [Span('governance-chunk', model_id, query['rule_id']) for _ in extracts_of_chunks]
+        outcomes = await asyncio.gather(*[
+            call_llm(chain, dict(query, api_spec=text), spec_tokens + estimate_tokens(query['standard_rule']) + OUTPUT_TOKENS_PER_RULE, part)
+            for (text, spec_tokens, _), part in zip(extracts_of_chunks, parts)
+        ], return_exceptions=True)
+        span = combine('governance-chunked', model_id, query['rule_id'], parts)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                # A chunk left out would make the recommendation look complete when it is not
+                if not isinstance(outcome, NotEvaluatedError):
+                    outcome = NotEvaluatedError(f"failed with {type(outcome).__name__}: {outcome}")
+                finish(query, not_evaluated(query, outcome, span), span)
+                return
+        result = merge_recommendations(outcomes)
+        await offload(cache.put, query['key'], result)
+        finish(query, result, span)
+
+    async def process_single_query(query: dict) -> None:
+        span = Span('governance', model_id, query['rule_id'])
+        tokens = query['spec_tokens'] + estimate_tokens(query['standard_rule']) + OUTPUT_TOKENS_PER_RULE
+        if tokens - OUTPUT_TOKENS_PER_RULE > PROMPT_TOKEN_BUDGET and len(await offload(spec_chunks, query['slice'])) > 1:
+            await process_chunked_query(query)
+            return
+        try:
+            result = await call_llm(chain, query, tokens, span)
+        except NotEvaluatedError as e:
+            finish(query, not_evaluated(query, e, span), span)
+            return
+        await offload(cache.put, query['key'], result)
+        finish(query, result, span)
+
+    async def process_batch(batch: list[dict]) -> None:
+        if len(batch) == 1:
+            await process_single_query(batch[0])
+            return
+
+        text, spec_tokens, _ = await offload(prompt_spec, req.api_spec, merge_slices([q['slice'] for q in batch]))
+        batch_query = {
+            'api_spec': text,
+            'standard_rules': '\n'.join(q['rule'].prompt_line for q in batch)
+        }
+        tokens = spec_tokens + estimate_tokens(batch_query['standard_rules']) + OUTPUT_TOKENS_PER_RULE * len(batch)
+        if tokens - OUTPUT_TOKENS_PER_RULE * len(batch) > PROMPT_TOKEN_BUDGET:
+            # Too big to share a call; each rule goes on its own, chunked if need be
+            await asyncio.gather(*[process_single_query(q) for q in batch])
+            return
+
+        span = Span('governance-batch', model_id, batch_size=len(batch))
+        verdicts = {}
+        try:
+            verdicts = parse_verdicts(await call_llm(batch_chain, batch_query, tokens, span))
+        except NotEvaluatedError as e:
+            for query in batch:
+                share = span.share(query['rule_id'], len(batch))
+                finish(query, not_evaluated(query, e, share), share)
+            return
+        except ValueError:
+            pass
+
+        answered = [query for query in batch if query['rule_id'] in verdicts]
+        await offload(lambda: [cache.put(query['key'], verdicts[query['rule_id']]) for query in answered])
+        for query in answered:
+            finish(query, verdicts[query['rule_id']], span.share(query['rule_id'], len(batch)))
+
+        # Rules the structured output did not cover fall back to individual calls
+        await asyncio.gather(*[process_single_query(q) for q in batch if q['rule_id'] not in verdicts])
+
+    async def process_multiple_queries(queries: list[dict]) -> None:
+        lookups: list[dict] = []
+        for query in queries:
+            if query['human_review']:
+                finish(query, "This guideline requires human review and cannot be validated by software.", Span('governance', '', query['rule_id'], 'human'))
+            elif query['check'] is not None and query['check'].decided:
+                query['report_rule'].compliant = not query['check'].findings
+                finish(query, query['check'].to_html(), Span('governance', '', query['rule_id'], 'checker'))
+            elif query['carried'] is not None:
+                query['llm'] = True
+                stats['hits'] += 1
+                finish(query, query['carried'], Span('governance', model_id, query['rule_id'], 'carried'))
+            else:
+                query['llm'] = True
+                query['key'] = verdict_key(query['spec_digest'], query['rule'].text, model_id, PROMPT_VERSION)
+                lookups.append(query)
+
+        pending: list[dict] = []
+        found = await offload(lambda: [cache.get(query['key']) for query in lookups])
+        for query, cached in zip(lookups, found):
+            if cached is not None:
+                stats['hits'] += 1
+                finish(query, cached, Span('governance', model_id, query['rule_id'], 'cache'))
+            else:
+                stats['misses'] += 1
+                pending.append(query)
+
+        await asyncio.gather(*[process_batch(batch) for batch in batches(pending, BATCH_MODE)])
+
+    queries: list[dict] = []
+
+    def build_queries() -> list[ReportSection]:
+        reportSections: list[ReportSection] = []
+        for section in asg.sections:
+            reportSectionRules: list[ReportSectionRule] = []
+            for rule in section.rules:
+                carried = None
+                if changes is not None and not rule.humanReview and not is_affected(changes, rule.slice, current_spec):
+                    # Verdicts are kept by rule fingerprint, so an edited rule is asked again
+                    carried = previous.verdicts.get(rule.fingerprint)
+
+                check = None
+                if rule.checker and not rule.humanReview:
+                    check = run_checker(rule.checker, req.api_spec)
+                    check.decided = check.decided and rule.checkerDecides
+
+                reportSectionRule = ReportSectionRule(
+                    rule=rule.rule,
+                    humanReview=rule.humanReview,
+                    recommendation=""
+                )
+                reportSectionRules.append(reportSectionRule)
+
+                text, spec_tokens, spec_digest = (None, 0, None) if rule.humanReview or carried is not None else prompt_spec(req.api_spec, rule.slice)
+                queries.append({
+                    'api_spec': text,
+                    'spec_tokens': spec_tokens,
+                    'spec_digest': spec_digest,
+                    'rule': rule,
+                    'rule_id': rule.id,
+                    'carried': carried,
+                    'slice': rule.slice,
+                    'standard_id': section.id,
+                    'standard_name': section.name,
+                    'standard_rule': rule.rule,
+                    'human_review': rule.humanReview,
+                    'check': check,
+                    'report_rule': reportSectionRule
+                })
+
+            reportSection = ReportSection(section.id, section.name, reportSectionRules)
+            for query in queries[len(queries) - len(reportSectionRules):]:
+                query['report_section'] = reportSection
+            reportSections.append(reportSection)
+        return reportSections
+
+    reportSections = await offload(build_queries)
+    report = Report(asg.name, reportSections)
+    await process_multiple_queries(queries)
+
+    def save() -> dict:
+        if revision:
+            verdicts = {q['rule'].fingerprint: results[q['rule_id']] for q in queries if q.get('llm') and q['rule_id'] not in failed}
+            get_revision_store().put(revision, Revision(current_spec, fingerprint, verdicts))
+        export_spans(spans, validator='api-standards-and-governance', spec=revision)
+        return summarize(spans, time.perf_counter() - started)
+
+    timing = await offload(save)
+    return ResponseModel(report, errors, cache_hits=stats['hits'], cache_misses=stats['misses'], timing=timing)
+
+def batches(queries: list[dict], mode: str) -> list[list[dict]]:
+    if mode == 'rulebook':
+        return [queries] if queries else []
+    if mode == 'section':
+        sections: dict[str, list[dict]] = {}
+        for query in queries:
+            sections.setdefault(query['standard_id'], []).append(query)
+        return list(sections.values())
+    return [[query] for query in queries]
+
+def merge_slices(slices: list[list[str]]) -> list[str]:
+    # A rule that needs the whole spec makes the whole batch need it
+    if any(not names for names in slices):
+        return []
+    return list(dict.fromkeys(name for names in slices for name in names))
+
+def parse_verdicts(raw: str) -> dict[str, str]:
+    raw = raw.strip()
+    if raw.startswith('```'):
+        raw = raw.strip('`')
+        raw = raw[raw.index('\n') + 1:] if '\n' in raw else raw
+    data = json.loads(raw)
+    if not isinstance(data, dict) or not isinstance(data.get('verdicts'), list):
+        raise ValueError("Structured output has no verdicts list")
+    return {
+        str(v['id']): v['recommendation']
+        for v in data['verdicts']
+        if isinstance(v, dict) and 'id' in v and isinstance(v.get('recommendation'), str)
+    }
+
+def prefix_findings(check, recommendation: str) -> str:
+    # Findings of a checker that could not decide on its own are shown ahead of the LLM's review
+    if check is None or not check.findings:
+        return recommendation
+    return check.to_html() + recommendation
@@ -0,0 +1,148 @@
+"""Benchmark the validators on synthetic specs, with the LLM stubbed.
+
+    python -m validator.benchmark --sizes 10,100,1000,10000 --json benchmark.json
+
+Every case runs in a fresh process so its peak RSS is its own. Prompt tokens are estimated
+the way the scheduler estimates them. Compare the JSON output of two versions to spot regressions.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+TARGETS = ("openapi", "schema", "governance")
+VARIANTS = ("compliant", "non-compliant")
+DEFAULT_SIZES = "10,100,1000,10000"
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def counting_backend(prompt_tokens: list[int]):
+    from .llm import FakeBackend, FakeChatModel
+    from .scheduler import estimate_tokens
+
+    class CountingChatModel(FakeChatModel):
+        def _result(self, messages, kwargs):
+            prompt_tokens.append(estimate_tokens("".join(str(m.content) for m in messages)))
+            return super()._result(messages, kwargs)
+
+    class CountingBackend(FakeBackend):
+        def chat_model(self, model, temperature):
+            return CountingChatModel(model=model)
+
+    return CountingBackend(latency=0.0, jitter=0.0, error_rate=0.0)
+
+def run_case(target: str, paths: int, compliant: bool, repeat: int, ref_depth: int) -> dict:
+    # Runs in its own process
+    from .models import RequestModel
+    from .synthetic import generate_spec
+
+    spec = generate_spec(paths, ref_depth=ref_depth, compliant=compliant)
+    prompt_tokens: list[int] = []
+    if target == "openapi":
+        from .openapi_standard import validate_api_spec
+        call = lambda i: validate_api_spec(RequestModel("json", spec))
+    elif target == "schema":
+        from .openapi_standard import validate_schema
+        call = lambda i: validate_schema(spec)
+    else:
+        from .api_standards_and_governance import validate_api_spec_async
+        from .llm import set_llm_backend
+        set_llm_backend(counting_backend(prompt_tokens))
+        # A new revision key each time, so nothing is carried over from the previous repeat
+        call = lambda i: asyncio.run(validate_api_spec_async(RequestModel("json", spec, f"benchmark-{i}")))
+
+    baseline_rss = peak_rss_bytes()
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "target": target,
+        "paths": paths,
+        "compliant": compliant,
+        "wall_seconds": round(min(timings), 4),
+        "wall_seconds_all": [round(t, 4) for t in timings],
+        "peak_rss_bytes": peak_rss_bytes(),
+        "rss_growth_bytes": peak_rss_bytes() - baseline_rss,
+        "llm_calls": len(prompt_tokens) // repeat,
+        "prompt_tokens": sum(prompt_tokens) // repeat,
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m validator.benchmark", description="Benchmark the validators on synthetic specs.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated path counts")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma separated subset of: " + ", ".join(TARGETS))
+    parser.add_argument("--variants", default="both", help="Comma separated subset of: " + ", ".join(VARIANTS) + "; or both")
+    parser.add_argument("--ref-depth", type=int, default=8, help="Length of the $ref chains in the generated specs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is reported")
+    parser.add_argument("--json", help="Write the results to this JSON file as well as stdout")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    if "both" in variants:
+        variants = list(VARIANTS)
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    # Inherited by the case processes: no caching, and no rate limiting of the stubbed LLM
+    os.environ["VERDICT_CACHE"] = "off"
+    os.environ["REVISION_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="benchmark-"), "revisions.sqlite")
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(10 ** 9)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(10 ** 12)
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for paths in sizes:
+        for variant in variants:
+            for target in targets:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    r = pool.submit(run_case, target, paths, variant == "compliant", args.repeat, args.ref_depth).result()
+                results.append(r)
+                print(
+                    f"{target:<11}{paths:>7} {variant:<14}{r['wall_seconds']:>9.3f} s{r['peak_rss_bytes'] / 1048576:>9.1f} MB"
+                    f"{r['llm_calls']:>6} calls{r['prompt_tokens']:>11} tokens",
+                    file=sys.stderr
+                )
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
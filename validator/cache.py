@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+try:
+    # Optional, much faster canonical serialisation of large specs
+    import orjson
+except ImportError:
+    orjson = None
+
+CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "./.cache/verdicts.sqlite")
+CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "5000"))
+CACHE_TTL_SECONDS = int(os.getenv("VERDICT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# "off" makes every lookup miss and stores nothing, e.g. to load-test the LLM path
+CACHE_ENABLED = os.getenv("VERDICT_CACHE", "on") != "off"
+
+def canonical_json(obj: Any) -> str:
+    # Key order and whitespace must not change the hash of an otherwise identical spec
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str).decode("utf-8")
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits
+    return json.dumps(str_keys(obj), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def str_keys(obj: Any) -> Any:
+    # YAML allows non-string keys such as response codes; sorting needs them all to be strings
+    if isinstance(obj, dict):
+        return {str(k): str_keys(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [str_keys(v) for v in obj]
+    return obj
+
+def spec_hash(api_spec: Any) -> str:
+    return hashlib.sha256(canonical_json(api_spec).encode("utf-8")).hexdigest()
+
+def verdict_key(spec_digest: str, rule: str, model: str, prompt_version: str) -> str:
+    parts = [spec_digest, hashlib.sha256(rule.encode("utf-8")).hexdigest(), model, prompt_version]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """Disk-backed LRU cache of LLM verdicts with a time-to-live."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL_SECONDS, enabled: bool = CACHE_ENABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE verdicts SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM verdicts")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            self._conn.execute("DELETE FROM verdicts WHERE created < ?", (now - self.ttl,))
+        if self.max_entries:
+            # Drop the least recently used entries beyond capacity
+            self._conn.execute(
+                "DELETE FROM verdicts WHERE key IN ("
+                " SELECT key FROM verdicts ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+_verdict_cache: Optional[VerdictCache] = None
+_verdict_cache_lock = threading.Lock()
+
+def get_verdict_cache() -> VerdictCache:
+    global _verdict_cache
+    with _verdict_cache_lock:
+        if _verdict_cache is None:
+            _verdict_cache = VerdictCache()
+        return _verdict_cache
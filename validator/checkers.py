@@ -0,0 +1,173 @@
+import html
+import re
+from typing import Any, Callable
+
+from .refs import deref, escape_pointer, resolver_scope
+from .slicing import as_dict, iter_operations, iter_parameters, iter_schema_properties
+
+class Finding:
+    def __init__(self, location: str, message: str):
+        self.location = location
+        self.message = message
+
+class CheckResult:
+    # decided is False when the checker cannot rule on compliance by itself and the LLM has to look too
+    def __init__(self, findings: list[Finding], decided: bool = True):
+        self.findings = findings
+        self.decided = decided
+
+    def to_html(self) -> str:
+        if not self.findings:
+            return "<p>Compliant. No issues found by the automated checks.</p>"
+        items = ''.join(
+            f"<li><code>{html.escape(f.location)}</code>: {html.escape(f.message)}</li>"
+            for f in self.findings
+        )
+        return f"<ul>{items}</ul>"
+
+CHECKERS: dict[str, Callable[[dict], CheckResult]] = {}
+
+def checker(name: str):
+    def register(fn: Callable[[dict], CheckResult]) -> Callable[[dict], CheckResult]:
+        CHECKERS[name] = fn
+        return fn
+    return register
+
+def run_checker(name: str, api_spec: Any) -> CheckResult:
+    if not isinstance(api_spec, dict):
+        return CheckResult([], decided=False)
+    try:
+        # Checkers look up refs property by property; one resolver serves them all
+        with resolver_scope():
+            return CHECKERS[name](api_spec)
+    except Exception:
+        # A checker must never fail the report; the rule is left to the LLM instead
+        return CheckResult([], decided=False)
+
+def words(name: str) -> list[str]:
+    # Split snake_case, kebab-case and camelCase names into lower-case words
+    spaced = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', name)
+    return [w.lower() for w in re.split(r'[^A-Za-z0-9]+', spaced) if w]
+
+def operation_pointer(path: str, method: str = None) -> str:
+    pointer = '/paths/' + escape_pointer(str(path))
+    return pointer + '/' + method if method else pointer
+
+KEBAB_SEGMENT = re.compile(r'^[a-z0-9]+(?:[-.][a-z0-9]+)*$')
+TEMPLATE_SEGMENT = re.compile(r'^\{[^}]+\}$')
+
+@checker('kebab_case_paths')
+def check_kebab_case_paths(api_spec: dict) -> CheckResult:
+    findings = []
+    for path in as_dict(api_spec.get('paths')):
+        for segment in str(path).split('/'):
+            if segment and not TEMPLATE_SEGMENT.match(segment) and not KEBAB_SEGMENT.match(segment):
+                findings.append(Finding(operation_pointer(path), f"Path segment '{segment}' is not lower-case kebab-case."))
+    return CheckResult(findings)
+
+LOWER_CAMEL_CASE = re.compile(r'^[a-z][a-zA-Z0-9]*$')
+
+@checker('lower_camel_case_query_parameters')
+def check_lower_camel_case_query_parameters(api_spec: dict) -> CheckResult:
+    findings = []
+    decided = True
+    for path, method, parameter in iter_parameters(api_spec):
+        if '$ref' in parameter:
+            decided = False
+            continue
+        if parameter.get('in') == 'query' and not LOWER_CAMEL_CASE.match(str(parameter.get('name', ''))):
+            findings.append(Finding(
+                operation_pointer(path, method),
+                f"Query parameter '{parameter.get('name')}' is not lowerCamelCase."
+            ))
+    return CheckResult(findings, decided)
+
+SENSITIVE_WORDS = {'nric', 'fin', 'uin', 'ssn', 'passport', 'passportno', 'nationalid', 'icno'}
+NRIC_VALUE = re.compile(r'\b[STFGM]\d{7}[A-Z]\b')
+
+@checker('sensitive_identifiers_in_uri')
+def check_sensitive_identifiers_in_uri(api_spec: dict) -> CheckResult:
+    findings = []
+    for path in as_dict(api_spec.get('paths')):
+        if NRIC_VALUE.search(str(path)) or SENSITIVE_WORDS & set(words(str(path))):
+            findings.append(Finding(operation_pointer(path), "Path contains an NRIC-like identifier."))
+    for path, method, parameter in iter_parameters(api_spec):
+        if parameter.get('in') not in ('query', 'path'):
+            continue
+        name = str(parameter.get('name', ''))
+        example = str(parameter.get('example', ''))
+        if SENSITIVE_WORDS & set(words(name)) or NRIC_VALUE.search(example):
+            findings.append(Finding(
+                operation_pointer(path, method),
+                f"{str(parameter.get('in')).capitalize()} parameter '{name}' carries an NRIC-like identifier."
+            ))
+    # Other kinds of sensitive data cannot be ruled out mechanically, so only a positive finding is final
+    return CheckResult(findings, decided=bool(findings))
+
+DATE_WORDS = {'date', 'time', 'datetime', 'timestamp', 'dob'}
+ISO8601 = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$')
+
+def looks_like_date(name: str) -> bool:
+    name_words = words(name)
+    # "at" only counts as a suffix, e.g. createdAt or updated_at
+    return bool(set(name_words) & DATE_WORDS) or (len(name_words) > 1 and name_words[-1] == 'at')
+
+def check_date_schema(location: str, name: str, schema: dict) -> list[Finding]:
+    if not isinstance(schema, dict):
+        return []
+    schema_format = schema.get('format')
+    if schema_format in ('date', 'date-time'):
+        example = schema.get('example')
+        if example is not None and not ISO8601.match(str(example)):
+            return [Finding(location, f"Example '{example}' of '{name}' is not an ISO8601 {schema_format}.")]
+        return []
+    if not looks_like_date(name):
+        return []
+    if schema.get('type') in ('integer', 'number'):
+        return [Finding(location, f"'{name}' is a numeric timestamp; use a string with format date-time (ISO8601).")]
+    if schema.get('type') == 'string':
+        return [Finding(location, f"'{name}' looks like a date or time but does not declare format date or date-time (ISO8601).")]
+    return []
+
+@checker('iso8601_date_time')
+def check_iso8601_date_time(api_spec: dict) -> CheckResult:
+    findings = []
+    for pointer, name, schema in iter_schema_properties(api_spec):
+        findings += check_date_schema(pointer, name, deref(api_spec, schema))
+    for path, method, parameter in iter_parameters(api_spec):
+        schema = deref(api_spec, parameter.get('schema') or {})
+        if not isinstance(schema, dict):
+            continue
+        findings += check_date_schema(operation_pointer(path, method), str(parameter.get('name', '')), dict(schema, example=parameter.get('example', schema.get('example'))))
+    return CheckResult(findings)
+
+# Verb prefixes of operationIds and the methods that fit them
+CRUD_VERBS = {
+    'get': {'get'}, 'list': {'get'}, 'find': {'get', 'post'}, 'search': {'get', 'post'}, 'fetch': {'get'},
+    'read': {'get'}, 'retrieve': {'get'},
+    'create': {'post'}, 'add': {'post'}, 'insert': {'post'}, 'register': {'post'},
+    'replace': {'post', 'put'},
+    'update': {'patch', 'put'}, 'modify': {'patch', 'put'}, 'edit': {'patch', 'put'}, 'patch': {'patch'},
+    'delete': {'delete'}, 'remove': {'delete'}
+}
+ACTION_VERBS = {verb for verb, methods in CRUD_VERBS.items() if 'get' not in methods}
+
+@checker('crud_methods')
+def check_crud_methods(api_spec: dict) -> CheckResult:
+    findings = []
+    for path, method, item, operation in iter_operations(api_spec):
+        location = operation_pointer(path, method)
+        if method in ('get', 'delete') and 'requestBody' in operation:
+            findings.append(Finding(location, f"{method.upper()} should not take a request body."))
+        operation_words = words(str(operation.get('operationId', '')))
+        if operation_words and operation_words[0] in CRUD_VERBS and method not in CRUD_VERBS[operation_words[0]]:
+            findings.append(Finding(
+                location,
+                f"operationId '{operation['operationId']}' suggests {'/'.join(sorted(m.upper() for m in CRUD_VERBS[operation_words[0]]))} but the method is {method.upper()}."
+            ))
+        segments = [s for s in str(path).split('/') if s and not TEMPLATE_SEGMENT.match(s)]
+        if segments and words(segments[-1])[:1] and words(segments[-1])[0] in ACTION_VERBS:
+            findings.append(Finding(location, f"Path ends in the action '{segments[-1]}'; let the HTTP method express the action."))
+    # Summaries, descriptions and operations without an operationId are beyond these checks,
+    # so only a positive finding is final
+    return CheckResult(findings, decided=bool(findings))
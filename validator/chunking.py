@@ -0,0 +1,205 @@
+import html
+import os
+import re
+from html.parser import HTMLParser
+from typing import Any, Callable, Optional
+
+from .cache import canonical_json
+from .refs import get_resolver
+from .scheduler import estimate_tokens
+from .slicing import HTTP_METHODS, as_dict
+
+# Prompt tokens one LLM call may use; gpt-4o-mini has a 128k context and needs room for its answer
+PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "100000"))
+
+# Left free in each chunk for the prompt template and the rule text
+CHUNK_HEADROOM_TOKENS = 4000
+
+def group_key(path: str, item: Any) -> str:
+    # Operations are grouped by their first tag, untagged ones by the first path segment
+    if isinstance(item, dict):
+        for method in HTTP_METHODS:
+            operation = item.get(method)
+            if isinstance(operation, dict) and operation.get('tags'):
+                return 'tag:' + str(operation['tags'][0])
+    segments = [s for s in str(path).split('/') if s]
+    return 'path:' + (segments[0] if segments else '')
+
+def chunk_spec(api_spec: Any, budget: int) -> list[Any]:
+    """Splits a spec into smaller specs of about budget tokens along tag and path boundaries.
+
+    Each chunk keeps everything but the paths, its own paths and only the components those
+    paths need. Sizes are measured on the minified JSON of the chunk itself; see chunk_to_fit for
+    sizing on what a prompt carries. A group of paths larger than the budget is split path by path;
+    a single path larger than the budget still makes a chunk of its own.
+    """
+    if not isinstance(api_spec, dict) or not isinstance(api_spec.get('paths'), dict) or len(api_spec['paths']) < 2:
+        return [api_spec]
+    if estimate_tokens(canonical_json(api_spec)) <= budget:
+        return [api_spec]
+
+    resolver = get_resolver(api_spec)
+    components = as_dict(api_spec.get('components'))
+    base_tokens = estimate_tokens(canonical_json({k: v for k, v in api_spec.items() if k not in ('paths', 'components')}))
+
+    def component_tokens(key: tuple[str, str]) -> int:
+        return estimate_tokens(canonical_json(as_dict(components.get(key[0])).get(key[1])))
+
+    groups: dict[str, list[str]] = {}
+    for path, item in api_spec['paths'].items():
+        groups.setdefault(group_key(path, item), []).append(path)
+
+    units: list[tuple[list[str], set, int]] = []
+    for paths in groups.values():
+        needs = set().union(*(resolver.components(api_spec['paths'][p]) for p in paths))
+        tokens = sum(estimate_tokens(canonical_json(api_spec['paths'][p])) for p in paths)
+        if base_tokens + tokens + sum(component_tokens(k) for k in needs) <= budget or len(paths) == 1:
+            units.append((paths, needs, tokens))
+        else:
+            for p in paths:
+                units.append(([p], resolver.components(api_spec['paths'][p]), estimate_tokens(canonical_json(api_spec['paths'][p]))))
+
+    # Greedy packing in spec order, counting each component once per chunk
+    chunks: list[tuple[list[str], set]] = []
+    paths: list[str] = []
+    needs: set = set()
+    size = base_tokens
+    for unit_paths, unit_needs, unit_tokens in units:
+        added = unit_tokens + sum(component_tokens(k) for k in unit_needs - needs)
+        if paths and size + added > budget:
+            chunks.append((paths, needs))
+            paths, needs, size = [], set(), base_tokens
+            added = unit_tokens + sum(component_tokens(k) for k in unit_needs)
+        paths.extend(unit_paths)
+        needs |= unit_needs
+        size += added
+    if paths:
+        chunks.append((paths, needs))
+
+    return [make_chunk(api_spec, paths, needs) for paths, needs in chunks]
+
+def make_chunk(api_spec: dict, paths: list, needs: set = None) -> dict:
+    """api_spec cut down to the given paths and the components they need (needs, when already known)."""
+    resolver = get_resolver(api_spec)
+    if needs is None:
+        needs = set().union(*(resolver.components(api_spec['paths'][p]) for p in paths))
+    chunk = {k: v for k, v in api_spec.items() if k not in ('paths', 'components')}
+    chunk['paths'] = {p: api_spec['paths'][p] for p in paths}
+    # Security schemes are small and apply everywhere
+    shared = {('securitySchemes', name) for name in as_dict(as_dict(api_spec.get('components')).get('securitySchemes'))}
+    chunk_components = resolver.select(needs | shared)
+    if chunk_components:
+        chunk['components'] = chunk_components
+    return chunk
+
+def chunk_to_fit(api_spec: Any, budget: int, measure: Callable[[Any], int]) -> list[Any]:
+    """chunk_spec, with every chunk whose prompt extract, as measure counts it, is still over budget halved again.
+
+    A rule's extract can be larger or smaller than the chunk it is taken from, so the chunks sized
+    on the raw spec are checked against what the prompt will actually carry.
+    """
+    result: list = []
+
+    def fit(chunk: Any) -> None:
+        paths = chunk.get('paths') if isinstance(chunk, dict) else None
+        if not isinstance(paths, dict) or len(paths) < 2 or measure(chunk) <= budget:
+            # A single path over the budget is sent as it is
+            result.append(chunk)
+            return
+        names = list(paths)
+        fit(make_chunk(chunk, names[:len(names) // 2]))
+        fit(make_chunk(chunk, names[len(names) // 2:]))
+
+    for chunk in chunk_spec(api_spec, budget):
+        fit(chunk)
+    return result
+
+# Elements without an end tag, and those a sibling of the same kind closes implicitly
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+IMPLIED_END_TAGS = {'li', 'p', 'tr', 'td', 'th', 'dt', 'dd', 'option'}
+TAG = re.compile(r'<[^>]+>')
+
+class FragmentParser(HTMLParser):
+    """Splits an HTML fragment into its top-level nodes as (tag, outer HTML, inner HTML).
+
+    The source text is kept verbatim; text and comments between elements come out with a tag of None.
+    """
+
+    def __init__(self, source: str):
+        super().__init__(convert_charrefs=False)
+        self.source = source
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+        self.stack: list[tuple[str, int, int]] = []
+        self.elements: list[tuple[str, int, int, int, int]] = []
+
+    def source_index(self) -> int:
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def close_top(self, end: int, inner_end: int) -> None:
+        tag, start, inner_start = self.stack.pop()
+        if not self.stack:
+            self.elements.append((tag, start, end, inner_start, inner_end))
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        start = self.source_index()
+        end = start + len(self.get_starttag_text() or '')
+        if tag in IMPLIED_END_TAGS and self.stack and self.stack[-1][0] == tag:
+            self.close_top(start, start)
+        if tag in VOID_TAGS:
+            if not self.stack:
+                self.elements.append((tag, start, end, end, end))
+            return
+        self.stack.append((tag, start, end))
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        if not self.stack:
+            start = self.source_index()
+            end = start + len(self.get_starttag_text() or '')
+            self.elements.append((tag, start, end, end, end))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in (t for t, _, _ in self.stack):
+            return  # A stray end tag stays in the text around it
+        start = self.source_index()
+        end = self.source.find('>', start) + 1 or len(self.source)
+        while self.stack[-1][0] != tag:
+            self.close_top(start, start)
+        self.close_top(end, start)
+
+    def nodes(self) -> list[tuple[Optional[str], str, str]]:
+        self.feed(self.source)
+        self.close()
+        while self.stack:
+            # Left open at the end of the fragment
+            self.close_top(len(self.source), len(self.source))
+        result: list[tuple[Optional[str], str, str]] = []
+        position = 0
+        for tag, start, end, inner_start, inner_end in sorted(self.elements, key=lambda e: e[1]):
+            if start > position:
+                result.append((None, self.source[position:start], self.source[position:start]))
+            result.append((tag, self.source[start:end], self.source[inner_start:inner_end]))
+            position = end
+        if position < len(self.source):
+            result.append((None, self.source[position:], self.source[position:]))
+        return result
+
+def merge_recommendations(results: list[str]) -> str:
+    """Merges the recommendations made for each chunk into one, dropping repeated points.
+
+    Top-level nodes are compared by their text; the items of top-level bulleted lists are merged
+    into one list and everything else is kept as it was written, in order.
+    """
+    seen: set[str] = set()
+    items: list[str] = []
+    blocks: list[str] = []
+    for result in results:
+        for tag, outer, inner in FragmentParser(result).nodes():
+            found = [(t, o) for t, o, _ in FragmentParser(inner).nodes()] if tag == 'ul' else [(tag, outer)]
+            for block_tag, block in found:
+                key = ' '.join(html.unescape(TAG.sub(' ', block)).lower().split())
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                (items if block_tag == 'li' else blocks).append(block.strip() if block_tag is None else block)
+    return ''.join(blocks) + (f"<ul>{''.join(items)}</ul>" if items else '')
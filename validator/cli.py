@@ -0,0 +1,158 @@
+"""Validate whole directories of API specs without the Streamlit app.
+
+    python -m validator.cli specs/ --jsonl results.jsonl --junit results.xml
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .ingest import ingest_file
+from .models import RequestModel, ResponseModel
+
+SPEC_EXTENSIONS = (".json", ".yaml", ".yml")
+VALIDATORS = ("openapi", "governance")
+
+def find_specs(targets: list[str]) -> list[str]:
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                paths += [os.path.join(root, f) for f in files if f.lower().endswith(SPEC_EXTENSIONS)]
+        else:
+            paths += [p for p in glob.glob(target, recursive=True) if os.path.isfile(p)]
+    return sorted(set(paths))
+
+def load_spec(path: str, rulebook: str = None) -> RequestModel:
+    spec = ingest_file(path)
+    return RequestModel(spec.format_type, spec.api_spec, rulebook=rulebook)
+
+def result(path: str, validator: str, started: float, response: Optional[ResponseModel] = None, error: str = None) -> dict:
+    failures = 0
+    if response is not None:
+        failures = sum(1 for s in response.report.sections for r in s.rules if r.compliant is False)
+    return {
+        "spec": path,
+        "validator": validator,
+        "elapsed": round(time.time() - started, 3),
+        "failures": failures,
+        "errors": ([error] if error else []) + (response.errors if response else []),
+        "response": response.to_dict() if response else None,
+    }
+
+def validate_structure(path: str) -> dict:
+    # Runs in a worker process, so it imports and loads everything itself
+    from .openapi_standard import validate_api_spec
+    started = time.time()
+    try:
+        return result(path, "openapi", started, validate_api_spec(load_spec(path)))
+    except Exception as e:
+        return result(path, "openapi", started, error=f"{type(e).__name__}: {e}")
+
+async def validate_governance(path: str, slots: asyncio.Semaphore, rulebook: str = None) -> dict:
+    from .api_standards_and_governance import validate_api_spec_async
+    async with slots:
+        started = time.time()
+        try:
+            req = await asyncio.get_running_loop().run_in_executor(None, load_spec, path, rulebook)
+            return result(path, "governance", started, await validate_api_spec_async(req))
+        except Exception as e:
+            return result(path, "governance", started, error=f"{type(e).__name__}: {e}")
+
+async def run(paths: list[str], validators: list[str], workers: int, concurrency: int, emit, rulebook: str = None) -> list[dict]:
+    loop = asyncio.get_running_loop()
+    tasks = []
+
+    if "openapi" in validators:
+        # Structural checks are CPU bound; LLM checks below are I/O bound and share one event loop
+        pool = ProcessPoolExecutor(max_workers=workers)
+        tasks += [loop.run_in_executor(pool, validate_structure, path) for path in paths]
+    else:
+        pool = None
+
+    if "governance" in validators:
+        slots = asyncio.Semaphore(concurrency)
+        tasks += [validate_governance(path, slots, rulebook) for path in paths]
+
+    results = []
+    try:
+        for future in asyncio.as_completed(tasks):
+            r = await future
+            emit(r)
+            results.append(r)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+def write_junit(results: list[dict], path: str) -> None:
+    suites = ET.Element("testsuites")
+    for r in sorted(results, key=lambda r: (r["spec"], r["validator"])):
+        suite = ET.SubElement(suites, "testsuite", name=f"{r['spec']} [{r['validator']}]", time=str(r["elapsed"]))
+        tests = 0
+        if r["response"]:
+            for section in r["response"]["report"]["sections"]:
+                for rule in section["rules"]:
+                    tests += 1
+                    case = ET.SubElement(suite, "testcase", classname=f"{r['validator']}.{section['id']}", name=rule["rule"][:200])
+                    if rule["compliant"] is False:
+                        ET.SubElement(case, "failure", message=f"{section['id']} {section['name']}").text = rule["recommendation"]
+                    elif rule["humanReview"]:
+                        ET.SubElement(case, "skipped", message="Requires human review")
+                    else:
+                        ET.SubElement(case, "system-out").text = rule["recommendation"]
+        for error in r["errors"]:
+            tests += 1
+            case = ET.SubElement(suite, "testcase", classname=r["validator"], name="validation")
+            ET.SubElement(case, "error", message=error[:200]).text = error
+        suite.set("tests", str(tests))
+        suite.set("failures", str(r["failures"]))
+        suite.set("errors", str(len(r["errors"])))
+    ET.ElementTree(suites).write(path, encoding="utf-8", xml_declaration=True)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m validator.cli", description="Validate API specs in bulk.")
+    parser.add_argument("targets", nargs="+", help="Spec files, directories or glob patterns")
+    parser.add_argument("--validators", default=",".join(VALIDATORS), help="Comma separated subset of: " + ", ".join(VALIDATORS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the structural checks")
+    parser.add_argument("--concurrency", type=int, default=16, help="Specs whose governance checks run at once")
+    parser.add_argument("--rulebook", help="Governance rulebook to validate against (see GOVERNANCE_RULEBOOK_PATHS)")
+    parser.add_argument("--jsonl", default="-", help="JSON Lines output file, '-' for stdout")
+    parser.add_argument("--junit", help="JUnit XML output file")
+    args = parser.parse_args(argv)
+
+    validators = [v.strip() for v in args.validators.split(",") if v.strip()]
+    unknown = set(validators) - set(VALIDATORS)
+    if unknown:
+        parser.error(f"unknown validators: {', '.join(sorted(unknown))}")
+
+    paths = find_specs(args.targets)
+    if not paths:
+        parser.error("no specs found")
+
+    out = sys.stdout if args.jsonl == "-" else open(args.jsonl, "w", encoding="utf-8")
+    try:
+        def emit(r: dict) -> None:
+            out.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+        results = asyncio.run(run(paths, validators, args.workers, args.concurrency, emit, args.rulebook))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.junit:
+        write_junit(results, args.junit)
+
+    failed = sum(1 for r in results if r["failures"] or r["errors"])
+    print(f"Validated {len(paths)} spec(s): {failed} of {len(results)} report(s) with failures or errors.", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
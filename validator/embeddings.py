@@ -0,0 +1,163 @@
+import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .llm import get_llm_backend
+from .scheduler import estimate_tokens
+from .telemetry import Span, span
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./.cache/embeddings.sqlite")
+# Bounds of one embeddings request; the provider allows 2048 inputs
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# remote (the LLM backend's embeddings endpoint) or local (sentence-transformers on the CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "remote")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "64"))
+# Model names of local embeddings carry this prefix, so cache keys and index versions never mix with remote ones
+LOCAL_PREFIX = "local:"
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Disk-backed embeddings keyed by model and content hash, stored as float32."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array("f", blob).tolist()
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)",
+                [(key, array.array("f", vector).tobytes(), now) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+_local_models: dict = {}
+_local_models_lock = threading.Lock()
+
+def get_local_model(model: str):
+    """The sentence-transformers model, loaded once per process."""
+    name = model[len(LOCAL_PREFIX):] if model.startswith(LOCAL_PREFIX) else model
+    with _local_models_lock:
+        if name not in _local_models:
+            from sentence_transformers import SentenceTransformer
+            _local_models[name] = SentenceTransformer(name, device="cpu")
+        return _local_models[name]
+
+def embed_local(texts: list[str], model: str) -> list[list[float]]:
+    # Unit length, so L2 distances in the index rank like cosine similarity
+    vectors = get_local_model(model).encode(
+        texts, batch_size=LOCAL_EMBED_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+    )
+    return vectors.tolist()
+
+def batches(texts: list[str], max_size: int = EMBED_BATCH_SIZE, max_tokens: int = EMBED_BATCH_TOKENS) -> list[list[str]]:
+    result: list[list[str]] = []
+    batch: list[str] = []
+    tokens = 0
+    for text in texts:
+        size = estimate_tokens(text)
+        if batch and (len(batch) >= max_size or tokens + size > max_tokens):
+            result.append(batch)
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += size
+    if batch:
+        result.append(batch)
+    return result
+
+def embed_texts(texts: list[str], model: str, on_span: Optional[Callable[[Span], None]] = None) -> list[list[float]]:
+    """Embeddings of texts in order. Only texts not cached yet are sent, in bounded batches run in parallel."""
+    cache = get_embedding_cache()
+    local = model.startswith(LOCAL_PREFIX)
+    backend = None if local else get_llm_backend()
+    keys = [embedding_key(model, text) for text in texts]
+    vectors = cache.get_many(list(dict.fromkeys(keys)))
+    missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in vectors))
+
+    def embed_batch(batch: list[str]) -> Span:
+        with span("embedding", model) as s:
+            if local:
+                s.source, s.cost_usd = "local", 0.0
+            s.batch_size = len(batch)
+            s.input_tokens = sum(estimate_tokens(t) for t in batch)
+            # Remote calls go through the pooled HTTP client, which already retries rate limits and server errors
+            embedded = embed_local(batch, model) if local else backend.embed(batch, model)
+        if len(embedded) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(embedded)}.")
+        items = {embedding_key(model, text): vector for text, vector in zip(batch, embedded)}
+        # Stored per batch, so a failure part way keeps the work already done
+        cache.put_many(items)
+        vectors.update(items)
+        return s
+
+    if missing:
+        # The local model already spreads a batch over the CPU cores; threads would only contend
+        with ThreadPoolExecutor(max_workers=1 if local else EMBED_CONCURRENCY) as pool:
+            size = LOCAL_EMBED_BATCH_SIZE if local else EMBED_BATCH_SIZE
+            futures = [pool.submit(embed_batch, batch) for batch in batches(missing, max_size=size)]
+            # Callbacks stay on the calling thread, which UI code such as Streamlit needs
+            for future in futures:
+                s = future.result()
+                if on_span:
+                    on_span(s)
+    return [vectors[key] for key in keys]
+
+def embed_query(text: str, model: str, on_span: Optional[Callable[[Span], None]] = None) -> list[float]:
+    """Embedding of a search query; local models skip the cache, since encoding one query takes milliseconds."""
+    if not model.startswith(LOCAL_PREFIX):
+        return embed_texts([text], model, on_span=on_span)[0]
+    with span("embedding", model) as s:
+        s.source, s.cost_usd = "local", 0.0
+        s.batch_size = 1
+        s.input_tokens = estimate_tokens(text)
+        vector = embed_local([text], model)[0]
+    if on_span:
+        on_span(s)
+    return vector
+
+def embedding_model() -> str:
+    """Name of the model EMBEDDING_BACKEND selects, as passed to embed_texts."""
+    if EMBEDDING_BACKEND == "local":
+        return LOCAL_PREFIX + LOCAL_EMBEDDING_MODEL
+    return os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
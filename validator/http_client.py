@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import queue
+import ssl
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import aiohttp
+import certifi
+
+from .scheduler import MAX_RETRIES, backoff, is_retryable, retry_after
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+# Longest silence while reading; a streamed reply only has to keep sending
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "60"))
+HTTP_TOTAL_TIMEOUT_SECONDS = float(os.getenv("HTTP_TOTAL_TIMEOUT_SECONDS", "300"))
+# Certificates are verified against certifi's bundle, or HTTP_CA_BUNDLE, e.g. one that includes an intercepting proxy's CA.
+# HTTP_VERIFY_SSL=false turns verification off, which exposes the API key on the wire; for local testing only.
+HTTP_CA_BUNDLE = os.getenv("HTTP_CA_BUNDLE") or certifi.where()
+HTTP_VERIFY_SSL = os.getenv("HTTP_VERIFY_SSL", "true").lower() not in ("0", "false", "no")
+
+class HTTPStatusError(Exception):
+    """Non-2xx response; carries the status and headers the scheduler's retry policy looks at."""
+
+    def __init__(self, status_code: int, body: str, headers: Any = None):
+        super().__init__(f"HTTP {status_code}: {body[:500]}")
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+class HTTPClient:
+    """One pooled aiohttp session on a background event loop, shared by every thread of the process.
+
+    Connections are kept alive between calls. Requests are retried on rate limits, server errors,
+    timeouts and dropped connections; streams only until their first chunk has arrived.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, max_retries: int = MAX_RETRIES):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+        threading.Thread(target=self.loop.run_forever, name="http-client", daemon=True).start()
+
+    def session(self) -> aiohttp.ClientSession:
+        # Created on the client's loop, which aiohttp requires
+        if self._session is None or self._session.closed:
+            ssl_context = ssl.create_default_context(cafile=HTTP_CA_BUNDLE) if HTTP_VERIFY_SSL else False
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=HTTP_KEEPALIVE_SECONDS, ssl=ssl_context),
+                timeout=aiohttp.ClientTimeout(
+                    total=HTTP_TOTAL_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS, sock_read=HTTP_READ_TIMEOUT_SECONDS
+                ),
+                json_serialize=lambda obj: json.dumps(obj, ensure_ascii=False),
+            )
+        return self._session
+
+    async def post_json(self, url: str, body: dict, headers: dict = None) -> Any:
+        attempt = 0
+        while True:
+            try:
+                async with self.session().post(url, json=body, headers=headers) as response:
+                    await raise_for_status(response)
+                    return await response.json(content_type=None)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(backoff(attempt, retry_after(e)))
+                attempt += 1
+
+    async def stream_events(self, url: str, body: dict, headers: dict = None) -> AsyncIterator[Any]:
+        """The JSON payloads of a server-sent event stream, such as a streamed chat completion."""
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self.session().post(url, json=body, headers=headers) as response:
+                    await raise_for_status(response)
+                    async for line in response.content:
+                        line = line.strip()
+                        if not line.startswith(b"data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == b"[DONE]":
+                            return
+                        started = True
+                        yield json.loads(data)
+                    return
+            except Exception as e:
+                # Part of the reply has been handed out already; a retry would repeat it
+                if started or not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(backoff(attempt, retry_after(e)))
+                attempt += 1
+
+    def request_json(self, url: str, body: dict, headers: dict = None) -> Any:
+        """post_json for synchronous callers."""
+        return asyncio.run_coroutine_threadsafe(self.post_json(url, body, headers), self.loop).result()
+
+    def iter_events(self, url: str, body: dict, headers: dict = None) -> Iterator[Any]:
+        """stream_events for synchronous callers; each event is handed over as soon as it arrives."""
+        events: queue.Queue = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for event in self.stream_events(url, body, headers):
+                    events.put(event)
+            except Exception as e:
+                events.put(e)
+            events.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                event = events.get()
+                if event is done:
+                    return
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            # Stops reading when the caller gives up early
+            future.cancel()
+
+async def raise_for_status(response: aiohttp.ClientResponse) -> None:
+    if response.status >= 400:
+        raise HTTPStatusError(response.status, await response.text(), response.headers)
+
+_client: Optional[HTTPClient] = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HTTPClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
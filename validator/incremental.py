@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from .cache import canonical_json
+from .slicing import SLICE_REGIONS, referenced_components
+
+REVISION_PATH = os.getenv("REVISION_STORE_PATH", "./.cache/revisions.sqlite")
+REVISION_MAX_ENTRIES = int(os.getenv("REVISION_STORE_MAX_ENTRIES", "200"))
+
+# Beyond this many changed nodes the edit is not small; re-evaluate everything and let the verdict cache help
+MAX_TRACKED_CHANGES = 5000
+
+class TooManyChanges(Exception):
+    pass
+
+def revision_key(api_spec: Any, explicit_key: str = None) -> Optional[str]:
+    if explicit_key:
+        return explicit_key
+    info = api_spec.get('info') if isinstance(api_spec, dict) else None
+    if not isinstance(info, dict) or not info.get('title'):
+        return None
+    return f"{info['title']}@{info.get('version', '')}"
+
+def normalize(api_spec: Any) -> Any:
+    # Revisions are stored as JSON, so compare against the JSON view of the new spec too
+    return json.loads(canonical_json(api_spec))
+
+def diff_pointers(old: Any, new: Any) -> set[tuple]:
+    """Pointers (as token tuples) of every node that was added, removed or changed.
+
+    Ancestors of a change are not reported; every node inside an added, removed or
+    replaced subtree is.
+    """
+    changes: set[tuple] = set()
+    _diff(old, new, (), changes)
+    return changes
+
+def _diff(old: Any, new: Any, pointer: tuple, changes: set) -> None:
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() | new.keys():
+            if key not in new:
+                _subtree(old[key], pointer + (str(key),), changes)
+            elif key not in old:
+                _subtree(new[key], pointer + (str(key),), changes)
+            else:
+                _diff(old[key], new[key], pointer + (str(key),), changes)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for i, (a, b) in enumerate(zip(old, new)):
+            _diff(a, b, pointer + (str(i),), changes)
+    else:
+        _subtree(old, pointer, changes)
+        _subtree(new, pointer, changes)
+    if len(changes) > MAX_TRACKED_CHANGES:
+        raise TooManyChanges()
+
+def _subtree(node: Any, pointer: tuple, changes: set) -> None:
+    changes.add(pointer)
+    if isinstance(node, dict):
+        for key, value in node.items():
+            _subtree(value, pointer + (str(key),), changes)
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            _subtree(value, pointer + (str(i),), changes)
+
+def pattern_matches(pattern: tuple, pointer: tuple) -> bool:
+    if not pattern:
+        return not pointer
+    if pattern[0] == '**':
+        return any(pattern_matches(pattern[1:], pointer[i:]) for i in range(len(pointer) + 1))
+    if not pointer:
+        return False
+    return (pattern[0] == '*' or pattern[0] == pointer[0]) and pattern_matches(pattern[1:], pointer[1:])
+
+def is_affected(changes: set[tuple], slice_names: list[str], api_spec: Any = None) -> bool:
+    """Whether any change falls in the spec regions the slices read.
+
+    Extracts carry the components their $refs reach, wherever those are defined; given the
+    current api_spec, changes to any of those components count as well.
+    """
+    if not changes:
+        return False
+    # A rule reading the whole spec is affected by any change
+    if not slice_names or 'full' in slice_names:
+        return True
+    patterns = [tuple(p.split('/')[1:]) for name in slice_names for p in SLICE_REGIONS[name]]
+    if any(pattern_matches(pattern, pointer) for pointer in changes for pattern in patterns):
+        return True
+    if not isinstance(api_spec, dict) or not any(pointer[:1] == ('components',) for pointer in changes):
+        return False
+    # Looked up in the current spec; a component no longer reached was cut off by an edit that is caught itself
+    reached = referenced_components(api_spec, slice_names)
+    return any(pointer[:1] == ('components',) and pointer[1:3] in reached for pointer in changes)
+
+class Revision:
+    def __init__(self, api_spec: Any, fingerprint: str, verdicts: dict[str, str]):
+        self.api_spec = api_spec
+        self.fingerprint = fingerprint
+        self.verdicts = verdicts
+
+class RevisionStore:
+    """Keeps the last validated revision of each spec with its rule verdicts, least recently used out."""
+
+    def __init__(self, path: str = REVISION_PATH, max_entries: int = REVISION_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS revisions ("
+            " key TEXT PRIMARY KEY,"
+            " spec TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " verdicts TEXT NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Revision]:
+        with self._lock:
+            row = self._conn.execute("SELECT spec, fingerprint, verdicts FROM revisions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE revisions SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return Revision(json.loads(row[0]), row[1], json.loads(row[2]))
+
+    def put(self, key: str, revision: Revision) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revisions (key, spec, fingerprint, verdicts, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, canonical_json(revision.api_spec), revision.fingerprint, json.dumps(revision.verdicts), time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM revisions WHERE key IN ("
+                " SELECT key FROM revisions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+_revision_store: Optional[RevisionStore] = None
+_revision_store_lock = threading.Lock()
+
+def get_revision_store() -> RevisionStore:
+    global _revision_store
+    with _revision_store_lock:
+        if _revision_store is None:
+            _revision_store = RevisionStore()
+        return _revision_store
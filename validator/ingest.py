@@ -0,0 +1,114 @@
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, Optional
+
+import yaml
+
+from .cache import spec_hash
+
+try:
+    # Optional, several times faster than the json module on large documents
+    import orjson
+except ImportError:
+    orjson = None
+
+# libyaml's C loader when PyYAML was built with it, the pure-Python loader otherwise
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+MAX_SPEC_BYTES = int(os.getenv("MAX_SPEC_BYTES", str(64 * 1024 * 1024)))
+MAX_SPEC_DEPTH = int(os.getenv("MAX_SPEC_DEPTH", "128"))
+TRACE_MEMORY = os.getenv("INGEST_TRACE_MEMORY", "0") == "1"
+
+class IngestError(ValueError):
+    pass
+
+class IngestedSpec:
+    def __init__(self, format_type: str, api_spec: Any, spec_hash: str, size_bytes: int, parse_seconds: float, peak_memory_bytes: Optional[int]):
+        self.format_type = format_type
+        self.api_spec = api_spec
+        self.spec_hash = spec_hash
+        self.size_bytes = size_bytes
+        self.parse_seconds = parse_seconds
+        # Only measured when tracing was asked for; tracing slows parsing down
+        self.peak_memory_bytes = peak_memory_bytes
+
+    def summary(self) -> str:
+        summary = f"Parsed {self.format_type.upper()} ({self.size_bytes / 1048576:.2f} MB) in {self.parse_seconds:.3f} s"
+        if self.peak_memory_bytes is not None:
+            summary += f", peak memory {self.peak_memory_bytes / 1048576:.1f} MB"
+        return summary + "."
+
+def sniff_format(data: bytes, filename: str = None) -> str:
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == ".json":
+            return "json"
+        if extension in (".yaml", ".yml"):
+            return "yaml"
+    # JSON documents that are specs start with an object; YAML ones almost never do
+    head = data[:64].lstrip(b"\xef\xbb\xbf \t\r\n")
+    return "json" if head[:1] in (b"{", b"[") else "yaml"
+
+def parse_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def parse_yaml(data: bytes) -> Any:
+    return yaml.load(data, Loader=YamlLoader)
+
+def check_depth(api_spec: Any, max_depth: int = MAX_SPEC_DEPTH) -> None:
+    # Iterative so deep documents cannot exhaust the stack; YAML aliases are visited once
+    seen = set()
+    stack = [(api_spec, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, (dict, list)):
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if depth > max_depth:
+                raise IngestError(f"The spec is nested deeper than {max_depth} levels.")
+            children = node.values() if isinstance(node, dict) else node
+            stack.extend((child, depth + 1) for child in children)
+
+def ingest(data: bytes, filename: str = None, format_type: str = None, trace_memory: bool = TRACE_MEMORY) -> IngestedSpec:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if len(data) > MAX_SPEC_BYTES:
+        raise IngestError(f"The spec is {len(data) / 1048576:.1f} MB; the limit is {MAX_SPEC_BYTES / 1048576:.0f} MB.")
+
+    format_type = format_type or sniff_format(data, filename)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        try:
+            if format_type == "json":
+                api_spec = parse_json(data)
+            else:
+                api_spec = parse_yaml(data)
+        except (ValueError, yaml.YAMLError) as e:
+            raise IngestError(f"The spec is not valid {format_type.upper()}: {e}") from e
+        except RecursionError as e:
+            raise IngestError(f"The spec is nested deeper than {MAX_SPEC_DEPTH} levels.") from e
+        parse_seconds = time.perf_counter() - started
+        peak_memory_bytes = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    if not isinstance(api_spec, dict):
+        # Scalars and lists parse fine but are not specs, and every validator expects a mapping
+        raise IngestError(f"The spec must be an object at the top level, not {'an empty document' if api_spec is None else type(api_spec).__name__}.")
+    check_depth(api_spec)
+    return IngestedSpec(format_type, api_spec, spec_hash(api_spec), len(data), parse_seconds, peak_memory_bytes)
+
+def ingest_file(path: str, trace_memory: bool = TRACE_MEMORY) -> IngestedSpec:
+    size = os.path.getsize(path)
+    if size > MAX_SPEC_BYTES:
+        raise IngestError(f"The spec is {size / 1048576:.1f} MB; the limit is {MAX_SPEC_BYTES / 1048576:.0f} MB.")
+    with open(path, "rb") as f:
+        return ingest(f.read(), os.path.basename(path), trace_memory=trace_memory)
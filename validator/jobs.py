@@ -0,0 +1,332 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from .api_standards_and_governance import validate_api_spec as validate_api_standards_and_governance
+from .cache import canonical_json, spec_hash
+from .models import Report, ReportSection, ReportSectionRule, RequestModel, ResponseModel
+from .openapi_standard import validate_api_spec as validate_openapi_standard
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "./.cache/jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# A running job whose worker has not renewed its lease for this long is taken over by another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Finished jobs are kept this long, so a refreshed page finds its results
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# At most this many finished jobs are kept, the most recently updated first; 0 for no limit
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+# How often a running queue prunes finished jobs
+JOB_PRUNE_SECONDS = float(os.getenv("JOB_PRUNE_SECONDS", "3600"))
+
+# Called as validator(req, on_result=callback), the callback getting each rule as it completes
+Validator = Callable[..., ResponseModel]
+
+# Validators jobs can run, by the name jobs are stored under, so any worker process can resume any job.
+# A new validator plugs in by being added here.
+JOB_VALIDATORS: dict[str, Validator] = {
+    "openapi-standard": validate_openapi_standard,
+    "api-standards-and-governance": validate_api_standards_and_governance,
+}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class Job:
+    """A snapshot of a job: its state, progress over the rules and the report so far."""
+
+    __slots__ = ('id', 'validator', 'status', 'attempts', 'created', 'updated', 'total', 'completed', 'error', 'response', 'report')
+
+    def __init__(self, id: str, validator: str, status: str, attempts: int, created: float, updated: float,
+                 total: int, completed: int, error: Optional[str], response: Optional[ResponseModel], report: Optional[Report]):
+        self.id = id
+        self.validator = validator
+        self.status = status
+        self.attempts = attempts
+        self.created = created
+        self.updated = updated
+        # Rules in the report and rules with a result; total is 0 until the validator has laid out its report
+        self.total = total
+        self.completed = completed
+        self.error = error
+        # The final response once done
+        self.response = response
+        # The report with the rules finished so far; unfinished rules have an empty recommendation
+        self.report = report
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+def encode_request(req: RequestModel) -> str:
+    return canonical_json({'format_type': req.format_type, 'api_spec': req.api_spec, 'spec_key': req.spec_key, 'rulebook': req.rulebook})
+
+def decode_request(data: str) -> RequestModel:
+    fields = json.loads(data)
+    return RequestModel(fields['format_type'], fields['api_spec'], fields.get('spec_key'), fields.get('rulebook'))
+
+def validator_name(validator: Validator) -> str:
+    for name, registered in JOB_VALIDATORS.items():
+        if registered is validator:
+            return name
+    raise ValueError(f"Validator {getattr(validator, '__qualname__', validator)} is not registered in JOB_VALIDATORS")
+
+class JobQueue:
+    """Validation jobs persisted in SQLite and run by a pool of worker threads.
+
+    Submitting the same request to the same validator again returns the existing job, unless it
+    failed or finished with errors. Workers hold a lease on the job they run and renew it while working; a job whose lease
+    ran out, because its process died, is picked up again by any worker sharing the store. Rules
+    finished before the crash are answered from the verdict cache, so their LLM calls are not paid twice.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, workers: int = JOB_WORKERS, lease: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.workers = workers
+        self.lease = lease
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running: set[str] = set()
+        self._started = False
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit, with explicit transactions where several statements must go together
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " validator TEXT NOT NULL,"
+            " dedupe_key TEXT NOT NULL,"
+            " request TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " owner TEXT,"
+            " lease_until REAL,"
+            " created REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " skeleton TEXT,"
+            " total INTEGER NOT NULL DEFAULT 0,"
+            " response TEXT,"
+            " error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_rules ("
+            " job_id TEXT NOT NULL,"
+            " section INTEGER NOT NULL,"
+            " rule INTEGER NOT NULL,"
+            " result TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, section, rule))"
+        )
+
+    def submit(self, req: RequestModel, validator: Validator, force: bool = False) -> str:
+        """Id of the job validating req; an unfinished or error-free job for the same request is reused unless force."""
+        validator = validator_name(validator)
+        request = encode_request(req)
+        dedupe_key = spec_hash([validator, request])
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if force:
+                    # Supersedes earlier jobs for the request; ones still running finish but are no longer found
+                    self._conn.execute("UPDATE jobs SET dedupe_key = id WHERE dedupe_key = ?", (dedupe_key,))
+                else:
+                    # Jobs that are waiting, running or done without errors; the rest are tried again
+                    row = self._conn.execute(
+                        "SELECT id FROM jobs WHERE dedupe_key = ? AND (status IN (?, ?) OR (status = ? AND error IS NULL))"
+                        " ORDER BY created DESC LIMIT 1",
+                        (dedupe_key, QUEUED, RUNNING, DONE)
+                    ).fetchone()
+                    if row is not None:
+                        self._conn.execute("COMMIT")
+                        return row[0]
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, validator, dedupe_key, request, status, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, validator, dedupe_key, request, QUEUED, now, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, validator, status, attempts, created, updated, total, skeleton, response, error FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            results = self._conn.execute("SELECT section, rule, result FROM job_rules WHERE job_id = ?", (job_id,)).fetchall()
+        id, validator, status, attempts, created, updated, total, skeleton, response, error = row
+        report = None
+        if skeleton is not None:
+            report = Report.from_dict(json.loads(skeleton))
+            for section, rule, result in results:
+                # An earlier attempt may have laid out a different report, e.g. under an edited rulebook
+                if section < len(report.sections) and rule < len(report.sections[section].rules):
+                    report.sections[section].rules[rule] = ReportSectionRule.from_dict(json.loads(result))
+        return Job(
+            id, validator, status, attempts, created, updated, total, len(results), error,
+            ResponseModel.from_dict(json.loads(response)) if response else None, report
+        )
+
+    def start(self) -> "JobQueue":
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        for n in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True).start()
+        threading.Thread(target=self._renew_leases, name="job-leases", daemon=True).start()
+        return self
+
+    def prune(self, retention: int = JOB_RETENTION_SECONDS, max_finished: int = JOB_MAX_FINISHED) -> None:
+        """Deletes finished jobs older than retention seconds and those beyond the max_finished most recent."""
+        cutoff = time.time() - retention
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, cutoff))
+                if max_finished:
+                    self._conn.execute(
+                        "DELETE FROM jobs WHERE id IN ("
+                        " SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                        (DONE, FAILED, max_finished)
+                    )
+                self._conn.execute("DELETE FROM job_rules WHERE job_id NOT IN (SELECT id FROM jobs)")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _work(self) -> None:
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                self._wake.wait(JOB_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self._run(*claimed)
+
+    def _claim(self) -> Optional[tuple[str, str, str, int]]:
+        # Queued jobs first, then jobs whose worker stopped renewing its lease
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, validator, request, attempts FROM jobs"
+                    " WHERE status = ? OR (status = ? AND lease_until < ?)"
+                    " ORDER BY status = ? DESC, created LIMIT 1",
+                    (QUEUED, RUNNING, now, QUEUED)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, validator, request, attempts = row
+                if attempts >= JOB_MAX_ATTEMPTS:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                        (FAILED, f"Gave up after {attempts} attempts", now, job_id)
+                    )
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ?, updated = ? WHERE id = ?",
+                    (RUNNING, self.owner, now + self.lease, now, job_id)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._running.add(job_id)
+        return job_id, validator, request, attempts + 1
+
+    def _run(self, job_id: str, validator: str, request: str, attempt: int) -> None:
+        positions: dict[int, tuple[int, int]] = {}
+
+        def on_result(report: Report, section: ReportSection, rule: ReportSectionRule) -> None:
+            if not positions:
+                # The validator has laid out the whole report; keep its outline for partial views
+                positions.update({
+                    id(r): (i, j) for i, s in enumerate(report.sections) for j, r in enumerate(s.rules)
+                })
+                skeleton = Report(report.name, [
+                    ReportSection(s.id, s.name, [ReportSectionRule(r.rule, r.humanReview, "") for r in s.rules])
+                    for s in report.sections
+                ])
+                self._execute(
+                    "UPDATE jobs SET skeleton = ?, total = ?, updated = ? WHERE id = ? AND owner = ?",
+                    (json.dumps(skeleton.to_dict(), ensure_ascii=False), len(positions), time.time(), job_id, self.owner)
+                )
+            i, j = positions[id(rule)]
+            self._execute(
+                "INSERT OR REPLACE INTO job_rules (job_id, section, rule, result) VALUES (?, ?, ?, ?)",
+                (job_id, i, j, json.dumps(rule.to_dict(), ensure_ascii=False))
+            )
+
+        try:
+            response = JOB_VALIDATORS[validator](decode_request(request), on_result=on_result)
+        except Exception as e:
+            status = QUEUED if attempt < JOB_MAX_ATTEMPTS else FAILED
+            self._execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated = ? WHERE id = ? AND owner = ?",
+                (status, f"{type(e).__name__}: {e}", time.time(), job_id, self.owner)
+            )
+        else:
+            # Errors such as rules that timed out still leave a useful report, but let the next submit try again
+            self._execute(
+                "UPDATE jobs SET status = ?, response = ?, error = ?, lease_until = NULL, updated = ? WHERE id = ? AND owner = ?",
+                (DONE, json.dumps(response.to_dict(), ensure_ascii=False, default=str), "; ".join(response.errors) or None,
+                 time.time(), job_id, self.owner)
+            )
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _renew_leases(self) -> None:
+        # Also prunes finished jobs now and then, so a long-running process does not keep them all
+        next_prune = 0.0
+        while True:
+            if time.time() >= next_prune:
+                try:
+                    self.prune()
+                    next_prune = time.time() + JOB_PRUNE_SECONDS
+                except sqlite3.Error:
+                    pass  # e.g. the store is locked by another process; the next round tries again
+            time.sleep(self.lease / 3)
+            with self._lock:
+                running = list(self._running)
+            for job_id in running:
+                self._execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+                    (time.time() + self.lease, job_id, self.owner, RUNNING)
+                )
+
+    def _execute(self, sql: str, parameters: tuple) -> None:
+        with self._lock:
+            self._conn.execute(sql, parameters)
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """The process's job queue, with its workers started."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue().start()
+        return _job_queue
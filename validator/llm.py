@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from .cache import canonical_json
+from .http_client import get_http_client
+from .scheduler import estimate_tokens
+
+# openai (live), record (live, saving every exchange to the cassette), replay (cassette, fake
+# replies for anything not recorded) or fake
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "./.cache/llm-cassette.jsonl")
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0"))
+FAKE_LLM_LATENCY_JITTER_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_JITTER_SECONDS", "0"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+
+OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+FAKE_EMBEDDING_DIMENSIONS = 1536
+
+class InjectedLLMError(Exception):
+    """Raised by the fake backends at the configured error rate; looks like a rate limit to the scheduler."""
+
+    status_code = 429
+
+def request_key(kind: str, model: str, payload: Any) -> str:
+    return hashlib.sha256(canonical_json([kind, model, payload]).encode("utf-8")).hexdigest()
+
+def message_pairs(messages: list) -> list:
+    # LangChain messages and OpenAI style dicts key the cassette the same way
+    roles = {"user": "human", "assistant": "ai"}
+    return [
+        (roles.get(m["role"], m["role"]), m["content"]) if isinstance(m, dict) else (m.type, m.content)
+        for m in messages
+    ]
+
+class Cassette:
+    """Append-only JSON Lines file of recorded LLM exchanges, looked up by request key."""
+
+    def __init__(self, path: str = LLM_CASSETTE_PATH):
+        self.path = path
+        self.entries: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry["response"]
+
+    def get(self, key: str) -> Any:
+        return self.entries.get(key)
+
+    def put(self, key: str, response: Any) -> None:
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = response
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
+
+class LLMBackend:
+    """Supplies the chat model the validators talk to, and the chat and embedding calls of the chat page."""
+
+    name = "base"
+    # Whether the backend calls the provider and so needs an API key
+    live = True
+
+    def chat_model(self, model: str, temperature: float) -> BaseChatModel:
+        raise NotImplementedError
+
+    def model_id(self, model: str) -> str:
+        # Part of cache keys, so verdicts of different backends never mix
+        return f"{self.name}:{model}"
+
+    def chat(self, messages: list[dict], model: str) -> str:
+        raise NotImplementedError
+
+    def stream_chat(self, messages: list[dict], model: str) -> Iterator[str]:
+        """The reply in pieces as they are generated; backends that cannot stream yield it whole."""
+        yield self.chat(messages, model)
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        raise NotImplementedError
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def chat_model(self, model: str, temperature: float) -> BaseChatModel:
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model=model,
+            temperature=temperature,
+            default_headers={"user-agent": "Mozilla/5.0 (X11; Linux x86_64; rv:60.0) Gecko/20100101 Firefox/81.0"},
+            max_retries=0,  # Retries are left to the scheduler
+        )
+
+    def model_id(self, model: str) -> str:
+        # Plain model name, as used by cache keys before backends existed
+        return model
+
+    def chat(self, messages: list[dict], model: str) -> str:
+        response = get_http_client().request_json(OPENAI_CHAT_URL, {"model": model, "messages": messages}, self._headers())
+        return response["choices"][0]["message"]["content"].strip()
+
+    def stream_chat(self, messages: list[dict], model: str) -> Iterator[str]:
+        body = {"model": model, "messages": messages, "stream": True}
+        for event in get_http_client().iter_events(OPENAI_CHAT_URL, body, self._headers()):
+            for choice in event.get("choices") or []:
+                piece = (choice.get("delta") or {}).get("content")
+                if piece:
+                    yield piece
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        response = get_http_client().request_json(OPENAI_EMBEDDINGS_URL, {"input": texts, "model": model}, self._headers())
+        return [item["embedding"] for item in response.get("data", [])]
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"}
+
+class RecordingChatModel(BaseChatModel):
+    """Passes calls through to a live chat model and saves each reply to the cassette."""
+
+    inner: Any
+    cassette: Any
+    model: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self.cassette.put(request_key("chat", self.model, [message_pairs(messages), kwargs]), result.generations[0].message.content)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        self.cassette.put(request_key("chat", self.model, [message_pairs(messages), kwargs]), result.generations[0].message.content)
+        return result
+
+class RecordBackend(OpenAIBackend):
+    name = "record"
+
+    def __init__(self, cassette: Optional[Cassette] = None):
+        self.cassette = cassette or Cassette()
+
+    def chat_model(self, model: str, temperature: float) -> BaseChatModel:
+        return RecordingChatModel(inner=super().chat_model(model, temperature), cassette=self.cassette, model=model)
+
+    def chat(self, messages: list[dict], model: str) -> str:
+        reply = super().chat(messages, model)
+        self.cassette.put(request_key("chat", model, [message_pairs(messages), {}]), reply)
+        return reply
+
+    def stream_chat(self, messages: list[dict], model: str) -> Iterator[str]:
+        pieces = []
+        for piece in super().stream_chat(messages, model):
+            pieces.append(piece)
+            yield piece
+        # Stored like a whole reply, so replay serves it to chat and stream_chat alike
+        self.cassette.put(request_key("chat", model, [message_pairs(messages), {}]), "".join(pieces).strip())
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        vectors = super().embed(texts, model)
+        for text, vector in zip(texts, vectors):
+            self.cassette.put(request_key("embed", model, text), vector)
+        return vectors
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline stand-in for the chat model, for tests and load tests.
+
+    Answers a batched governance prompt with one JSON verdict per listed standard id
+    and any other prompt with a short HTML paragraph derived from the prompt's hash.
+    Replies recorded in a cassette are replayed instead when there is one.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    cassette: Any = None
+    model: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages, kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result(messages, kwargs)
+
+    def _delay(self) -> float:
+        return self.latency + random.uniform(0, self.jitter)
+
+    def _result(self, messages, kwargs: dict) -> ChatResult:
+        if self.error_rate and random.random() < self.error_rate:
+            raise InjectedLLMError("Injected LLM error")
+        reply = self.cassette.get(request_key("chat", self.model, [message_pairs(messages), kwargs])) if self.cassette else None
+        if reply is None:
+            reply = fake_reply(str(messages[-1].content))
+        # Estimated the way the scheduler estimates, so load tests report plausible token counts
+        input_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        usage = {"input_tokens": input_tokens, "output_tokens": estimate_tokens(reply), "total_tokens": input_tokens + estimate_tokens(reply)}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply, usage_metadata=usage))])
+
+def fake_reply(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    if '"verdicts"' in prompt:
+        ids = re.findall(r"^\s*\[([^\]]+)\]", prompt, re.M)
+        return json.dumps({"verdicts": [
+            {"id": i, "recommendation": f"<p>Offline review {digest} of standard {i}: no issues found.</p>"} for i in ids
+        ]})
+    return f"<p>Offline review {digest}: no issues found.</p>"
+
+def fake_embedding(text: str, dimensions: int = FAKE_EMBEDDING_DIMENSIONS) -> list[float]:
+    # Unit vector seeded by the text, so equal texts embed equally
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+class FakeBackend(LLMBackend):
+    name = "fake"
+    live = False
+
+    def __init__(self, latency: float = FAKE_LLM_LATENCY_SECONDS, jitter: float = FAKE_LLM_LATENCY_JITTER_SECONDS, error_rate: float = FAKE_LLM_ERROR_RATE, cassette: Optional[Cassette] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.cassette = cassette
+
+    def chat_model(self, model: str, temperature: float) -> BaseChatModel:
+        return FakeChatModel(latency=self.latency, jitter=self.jitter, error_rate=self.error_rate, cassette=self.cassette, model=model)
+
+    def chat(self, messages: list[dict], model: str) -> str:
+        self._simulate()
+        return self._reply(messages, model)
+
+    def stream_chat(self, messages: list[dict], model: str) -> Iterator[str]:
+        # The first piece after a fifth of the latency, the rest spread over the remainder
+        delay = self.latency + random.uniform(0, self.jitter)
+        time.sleep(delay / 5)
+        if self.error_rate and random.random() < self.error_rate:
+            raise InjectedLLMError("Injected LLM error")
+        pieces = re.findall(r"\S+\s*", self._reply(messages, model)) or [""]
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(delay * 4 / 5 / len(pieces))
+            yield piece
+
+    def _reply(self, messages: list[dict], model: str) -> str:
+        reply = self.cassette.get(request_key("chat", model, [message_pairs(messages), {}])) if self.cassette else None
+        return reply if reply is not None else fake_reply(messages[-1]["content"])
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        self._simulate()
+        vectors = []
+        for text in texts:
+            vector = self.cassette.get(request_key("embed", model, text)) if self.cassette else None
+            vectors.append(vector if vector is not None else fake_embedding(text))
+        return vectors
+
+    def _simulate(self) -> None:
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.error_rate and random.random() < self.error_rate:
+            raise InjectedLLMError("Injected LLM error")
+
+class ReplayBackend(FakeBackend):
+    name = "replay"
+
+    def __init__(self, cassette: Optional[Cassette] = None, **kwargs):
+        super().__init__(cassette=cassette or Cassette(), **kwargs)
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "record": RecordBackend,
+    "replay": ReplayBackend,
+    "fake": FakeBackend,
+}
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+def get_llm_backend() -> LLMBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[LLM_BACKEND]()
+        return _backend
+
+def set_llm_backend(backend: Any) -> LLMBackend:
+    """Selects the backend by name or instance for the rest of the process."""
+    global _backend
+    with _backend_lock:
+        _backend = BACKENDS[backend]() if isinstance(backend, str) else backend
+        return _backend
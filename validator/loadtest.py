@@ -0,0 +1,160 @@
+"""Load-test the validators and the chat page's LLM calls with simulated users.
+
+    python -m validator.loadtest specs/petstore.yaml --users 20 --requests 5 --llm fake --latency 0.8
+
+Each user sends its requests one after another; users run concurrently. Unless --warm is given
+the verdict cache is off and every request is a fresh spec, so the LLM path is exercised each time.
+With the fake and replay backends the LLM rate budgets are lifted unless --budget production is given,
+so the run measures the service rather than the rate limiter.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+SCENARIOS = ("openapi", "governance", "chat")
+CHAT_QUESTION = "How should I version a public REST API?"
+CHAT_CONTEXT = "APIs are versioned in the URI with a major version, e.g. /v1/. Breaking changes need a new major version."
+
+def percentile(values: list[float], p: float) -> float:
+    # Nearest rank
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(samples: dict[str, list[tuple[float, bool]]], elapsed: float) -> dict:
+    summary = {"elapsed": round(elapsed, 3), "scenarios": {}}
+    for scenario, results in samples.items():
+        latencies = [latency for latency, ok in results]
+        summary["scenarios"][scenario] = {
+            "requests": len(results),
+            "errors": sum(1 for latency, ok in results if not ok),
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies, default=0.0), 3),
+            "throughput": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        }
+    return summary
+
+def chat_turn(question: str) -> float:
+    """Embeds the question and streams the answer like the chat page; returns the time to the first piece.
+
+    Retrieval is not simulated.
+    """
+    from .llm import get_llm_backend
+    backend = get_llm_backend()
+    started = time.perf_counter()
+    backend.embed([question], "text-embedding-ada-002")
+    first_token = None
+    for _ in backend.stream_chat([
+        {"role": "system", "content": "You are an expert assistant that answers questions strictly using the provided context."},
+        {"role": "system", "content": f"Context:\n{CHAT_CONTEXT}"},
+        {"role": "user", "content": question},
+    ], "gpt-4-turbo"):
+        if first_token is None:
+            first_token = time.perf_counter() - started
+    return first_token if first_token is not None else time.perf_counter() - started
+
+async def simulate_user(user: int, spec, scenarios: list[str], requests: int, warm: bool, samples: dict) -> None:
+    from .api_standards_and_governance import validate_api_spec_async
+    from .models import RequestModel
+    from .openapi_standard import validate_api_spec
+    loop = asyncio.get_running_loop()
+
+    for i in range(requests):
+        api_spec, key = spec.api_spec, None
+        if not warm and isinstance(api_spec, dict):
+            # A new description and revision key per request defeat every cache
+            info = dict(api_spec.get("info") or {})
+            info["description"] = f"{info.get('description', '')} [load test {user}.{i}]"
+            api_spec, key = dict(api_spec, info=info), f"loadtest-{user}-{i}-{time.time_ns()}"
+        req = RequestModel(spec.format_type, api_spec, key)
+
+        for scenario in scenarios:
+            started = time.perf_counter()
+            try:
+                if scenario == "openapi":
+                    ok = not (await loop.run_in_executor(None, validate_api_spec, req)).errors
+                elif scenario == "governance":
+                    ok = not (await validate_api_spec_async(req)).errors
+                else:
+                    first_token = await loop.run_in_executor(None, chat_turn, f"{CHAT_QUESTION} ({user}.{i})")
+                    samples["chat-ttft"].append((first_token, True))
+                    ok = True
+            except Exception:
+                ok = False
+            samples[scenario].append((time.perf_counter() - started, ok))
+
+async def run(spec, users: int, requests: int, scenarios: list[str], warm: bool) -> dict:
+    samples = {scenario: [] for scenario in scenarios}
+    if "chat" in scenarios:
+        # Time to the first streamed piece of each chat answer
+        samples["chat-ttft"] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate_user(u, spec, scenarios, requests, warm, samples) for u in range(users)))
+    return summarize(samples, time.perf_counter() - started)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m validator.loadtest", description="Load-test the validators with simulated users.")
+    parser.add_argument("spec", help="Spec file every simulated user submits")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=3, help="Requests per user and scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--llm", default="fake", choices=("openai", "record", "replay", "fake"), help="LLM backend")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per fake or replayed LLM call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Up to this many seconds added to each fake call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake calls that fail like a rate limit")
+    parser.add_argument("--warm", action="store_true", help="Keep caches on and submit the same spec every time")
+    parser.add_argument("--budget", choices=("auto", "production", "unlimited"), default="auto",
+                        help="LLM rate budgets: production keeps LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE, "
+                             "unlimited lifts them, auto lifts them for the fake and replay backends only")
+    parser.add_argument("--json", help="Also write the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if not args.warm:
+        # Read when the validator modules are imported, so set before importing them
+        scratch = tempfile.mkdtemp(prefix="loadtest-")
+        os.environ["VERDICT_CACHE"] = "off"
+        os.environ["REVISION_STORE_PATH"] = os.path.join(scratch, "revisions.sqlite")
+
+    if args.budget == "unlimited" or (args.budget == "auto" and args.llm in ("fake", "replay")):
+        # Also read at import; simulated calls cost nothing, so only the service itself should limit them
+        os.environ["LLM_REQUESTS_PER_MINUTE"] = str(10 ** 9)
+        os.environ["LLM_TOKENS_PER_MINUTE"] = str(10 ** 12)
+
+    from .ingest import ingest_file
+    from .scheduler import REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+    from .llm import FakeBackend, ReplayBackend, set_llm_backend
+    if args.llm == "fake":
+        set_llm_backend(FakeBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate))
+    elif args.llm == "replay":
+        set_llm_backend(ReplayBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate))
+    else:
+        set_llm_backend(args.llm)
+
+    summary = asyncio.run(run(ingest_file(args.spec), args.users, args.requests, scenarios, args.warm))
+    summary.update(users=args.users, requests=args.requests, llm=args.llm,
+                   budget={"requests_per_minute": REQUESTS_PER_MINUTE, "tokens_per_minute": TOKENS_PER_MINUTE})
+
+    print(f"{'scenario':<12}{'requests':>10}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}")
+    for scenario, s in summary["scenarios"].items():
+        print(f"{scenario:<12}{s['requests']:>10}{s['errors']:>8}{s['p50']:>9.3f}{s['p95']:>9.3f}{s['p99']:>9.3f}{s['throughput']:>9.2f}")
+    print(f"{args.users} users, {summary['elapsed']:.1f} s, budget {REQUESTS_PER_MINUTE} requests and {TOKENS_PER_MINUTE} tokens per minute", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,84 @@
-from typing import Any
+from typing import Any, Callable, Optional
 
 
 class RequestModel:
-    def __init__(self, format_type: str, api_spec: Any):
+    __slots__ = ('format_type', 'api_spec', 'spec_key', 'rulebook')
+
+    def __init__(self, format_type: str, api_spec: Any, spec_key: str = None, rulebook: str = None):
         self.format_type = format_type
         self.api_spec = api_spec
+        # Identifies revisions of the same spec; defaults to info.title@info.version
+        self.spec_key = spec_key
+        # Name of the governance rulebook to validate against; the default one when None
+        self.rulebook = rulebook
+
+# Report objects are slotted: a large report holds thousands of them, in the result store and in session state
 
 class ReportSectionRule:
-    def __init__(self, rule: str, humanReview: bool, recommendation: str):
+    __slots__ = ('rule', 'humanReview', 'recommendation', 'compliant', 'timing')
+
+    def __init__(self, rule: str, humanReview: bool, recommendation: str, compliant: Optional[bool] = None, timing: Optional[dict] = None):
         self.rule = rule
         self.humanReview = humanReview
         self.recommendation = recommendation
+        # True/False when compliance was decided mechanically, None when it is left to a reader
+        self.compliant = compliant
+        # Queue wait, latency, tokens, retries and cost of reaching the recommendation (see telemetry.Span)
+        self.timing = timing
+
+    def to_dict(self) -> dict:
+        return {'rule': self.rule, 'humanReview': self.humanReview, 'recommendation': self.recommendation, 'compliant': self.compliant, 'timing': self.timing}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReportSectionRule":
+        return cls(data['rule'], data['humanReview'], data['recommendation'], data.get('compliant'), data.get('timing'))
 
 class ReportSection:
+    __slots__ = ('id', 'name', 'rules')
+
     def __init__(self, id, name: str, rules: list[ReportSectionRule]):
         self.id = id
         self.name = name
         self.rules = rules
 
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'name': self.name, 'rules': [r.to_dict() for r in self.rules]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReportSection":
+        return cls(data['id'], data['name'], [ReportSectionRule.from_dict(r) for r in data['rules']])
+
 class Report:
+    __slots__ = ('name', 'sections')
+
     def __init__(self, name: str, sections: list[ReportSection]):
         self.name = name
         self.sections = sections
 
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'sections': [s.to_dict() for s in self.sections]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Report":
+        return cls(data['name'], [ReportSection.from_dict(s) for s in data['sections']])
+
 class ResponseModel:
-    def __init__(self, report: Report, errors: list[str]):
+    __slots__ = ('report', 'errors', 'cache_hits', 'cache_misses', 'timing')
+
+    def __init__(self, report: Report, errors: list[str], cache_hits: int = 0, cache_misses: int = 0, timing: Optional[dict] = None):
         self.report = report
-        self.errors = errors
\ No newline at end of file
+        self.errors = errors
+        self.cache_hits = cache_hits
+        self.cache_misses = cache_misses
+        # Totals over the rules' timings
+        self.timing = timing
+
+    def to_dict(self) -> dict:
+        return {'report': self.report.to_dict(), 'errors': self.errors, 'cache_hits': self.cache_hits, 'cache_misses': self.cache_misses, 'timing': self.timing}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResponseModel":
+        return cls(Report.from_dict(data['report']), data['errors'], data.get('cache_hits', 0), data.get('cache_misses', 0), data.get('timing'))
+
+# Called with the report, section and rule each time a rule's recommendation is ready
+ResultCallback = Optional[Callable[[Report, ReportSection, ReportSectionRule], None]]
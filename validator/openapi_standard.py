@@ -1,17 +1,30 @@
+import html
 import json
+import os
 import re
-import yaml
-from jsonschema import validate, ValidationError
+import threading
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
-from .models import RequestModel, ReportSectionRule, ReportSection, Report, ResponseModel
+try:
+    # Optional native validator; an order of magnitude faster on large specs
+    import jsonschema_rs
+except ImportError:
+    jsonschema_rs = None
+
+from .cache import str_keys
+from .ingest import IngestError, ingest
+from .models import RequestModel, ReportSectionRule, ReportSection, Report, ResponseModel, ResultCallback
+from .refs import get_resolver
 
 # Function to validate API specs and return simplified error messages
-def validate_api_spec(req:RequestModel) -> ResponseModel:
+def validate_api_spec(req:RequestModel, on_result: ResultCallback = None) -> ResponseModel:
     # Section - Syntax Validation
     syntax_validation_rule = ReportSectionRule(
         rule="Check if the provided spec is valid JSON or YAML.",
         humanReview=False,
-        recommendation=str.upper(req.format_type)
+        recommendation=str.upper(req.format_type),
+        compliant=True
     )
     syntax_validation_section = ReportSection(
         id="1.0",
@@ -20,8 +33,9 @@ def validate_api_spec(req:RequestModel) -> ResponseModel:
     )
 
     # Section - Version Compatibility
-    regex = re.compile(openapi_schema_version())
-    if ('openapi' in req.api_spec) and (regex.match(req.api_spec['openapi'])):
+    regex = STANDARD_SCHEMA.version_regex()
+    version_compatible = isinstance(req.api_spec, dict) and ('openapi' in req.api_spec) and bool(regex.match(str(req.api_spec['openapi'])))
+    if version_compatible:
         version_compatibility_message = f"Version compatibility check passed. (Version {req.api_spec['openapi']})"
     else:
         version_compatibility_message = "Version compatibility check failed."
@@ -29,7 +43,8 @@ def validate_api_spec(req:RequestModel) -> ResponseModel:
     version_compatibility_rule = ReportSectionRule(
         rule="Verify the spec matches the declared OpenAPI version.",
         humanReview=False,
-        recommendation=version_compatibility_message
+        recommendation=version_compatibility_message,
+        compliant=version_compatible
     )
     version_compatibility_section = ReportSection(
         id="2.0",
@@ -38,10 +53,12 @@ def validate_api_spec(req:RequestModel) -> ResponseModel:
     )
 
     # Section - Schema Validation
+    schema_validation_message = validate_schema(req.api_spec)
     schema_validation_rule = ReportSectionRule(
         rule="Ensure the spec adheres to the OpenAPI schema structure.",
         humanReview=False,
-        recommendation=validate_schema(req.api_spec)
+        recommendation=schema_validation_message,
+        compliant=schema_validation_message == SCHEMA_COMPLIES
     )
     schema_validation_section = ReportSection(
         id="3.0",
@@ -55,40 +72,121 @@ def validate_api_spec(req:RequestModel) -> ResponseModel:
         sections=[syntax_validation_section, version_compatibility_section, schema_validation_section]
     )
 
+    if on_result:
+        for section in report.sections:
+            for rule in section.rules:
+                on_result(report, section, rule)
+
     return ResponseModel(
         report=report,
         errors=[])
 
+SCHEMA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Report at most this many schema violations; the rest are counted
+MAX_REPORTED_ERRORS = 200
+
+SCHEMA_COMPLIES = "Complies to OpenAPI schema."
+
+class CompiledSchema:
+    """JSON schema compiled into a validator once and recompiled whenever the file changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._schema = None
+        self._validator = None
+        self._native_validator = None
+        self._version_regex = None
+
+    def _load(self) -> None:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r") as f:
+                schema = json.load(f)
+            cls = validator_for(schema)
+            self._validator = cls(schema)
+            self._native_validator = jsonschema_rs.validator_for(schema) if jsonschema_rs else None
+            pattern = schema.get('properties', {}).get('openapi', {}).get('pattern')
+            self._version_regex = re.compile(pattern) if pattern else None
+            self._schema = schema
+            self._mtime = mtime
+
+    def schema(self) -> dict:
+        self._load()
+        return self._schema
+
+    def iter_errors(self, instance):
+        """Yields (JSON pointer, message) for every violation."""
+        self._load()
+        # The JSON view of the instance: YAML loads unquoted keys such as response codes as ints,
+        # which patternProperties cannot match
+        instance = str_keys(instance)
+        if self._native_validator is not None:
+            try:
+                errors = list(self._native_validator.iter_errors(instance))
+            except (TypeError, ValueError):
+                # Values the native validator cannot take, e.g. dates parsed from YAML
+                errors = None
+            if errors is not None:
+                for e in errors:
+                    yield "/" + "/".join(str(p) for p in e.instance_path), e.message
+                return
+        for e in self._validator.iter_errors(instance):
+            # oneOf/anyOf failures carry the reasons of each branch; report the most relevant one
+            e = best_match([e])
+            yield json_pointer(e.absolute_path), e.message
+
+    def version_regex(self):
+        self._load()
+        return self._version_regex
+
+STANDARD_SCHEMA = CompiledSchema(os.path.join(SCHEMA_DIR, "openapi_standard_schema.json"))
+META_SCHEMAS = {
+    "3.0": CompiledSchema(os.path.join(SCHEMA_DIR, "openapi_3_0_schema.json")),
+    "3.1": CompiledSchema(os.path.join(SCHEMA_DIR, "openapi_3_1_schema.json")),
+}
+
+def schema_for(api_spec) -> CompiledSchema:
+    # The declared openapi version picks the meta-schema; anything else is checked against the standard schema
+    version = str(api_spec.get('openapi', '')) if isinstance(api_spec, dict) else ''
+    return META_SCHEMAS.get(version[:3], STANDARD_SCHEMA)
+
+def json_pointer(path) -> str:
+    return "/" + "/".join(str(p).replace("~", "~0").replace("/", "~1") for p in path) if path else "/"
+
 def validate_schema(api_spec) -> str:
-    # Load OpenAPI standard schema from external JSON file
-    with open("./validator/openapi_standard_schema.json", "r") as f:
-        openapi_standard = json.load(f)
+    errors = list(schema_for(api_spec).iter_errors(api_spec))
+    # The meta-schema only checks the shape of a $ref, not that it points anywhere
+    if isinstance(api_spec, dict):
+        errors += get_resolver(api_spec).errors()
+    errors.sort()
+    if not errors:
+        return SCHEMA_COMPLIES
 
-    try:
-        validate(instance=api_spec, schema=openapi_standard)
-        return "Complies to OpenAPI schema."
-    except ValidationError as e:
-        # Extract relevant error information
-        error_path = " -> ".join([str(x) for x in list(e.path)]) if e.path else "Unknown path"
-        error_message = f"Error at {error_path}: {e.message}"
-        return error_message
+    items = [
+        f"<li>Error at <code>{html.escape(pointer)}</code>: {html.escape(message)}</li>"
+        for pointer, message in errors[:MAX_REPORTED_ERRORS]
+    ]
+    if len(errors) > MAX_REPORTED_ERRORS:
+        items.append(f"<li>... and {len(errors) - MAX_REPORTED_ERRORS} more errors.</li>")
+    return f"Found {len(errors)} schema violation(s):<ul>{''.join(items)}</ul>"
 
 def openapi_schema_version() -> str:
-    with open("./validator/openapi_standard_schema.json", "r") as f:
-        openapi_standard = json.load(f)
-
-    return openapi_standard['properties']['openapi']['pattern']
+    return STANDARD_SCHEMA.schema()['properties']['openapi']['pattern']
 
 def get_api_spec(file):
+    # Read once; trying JSON and then YAML on the same stream used to parse an already consumed file
     try:
-        api_spec = json.load(file)
-        return api_spec, green("JSON")
-    except ValueError:
-        try:
-            api_spec = yaml.safe_load(file)
-            return api_spec, green("YAML")
-        except yaml.YAMLError:
-            return {}, red("Unknown")
+        spec = ingest(file.read(), getattr(file, 'name', None))
+        return spec.api_spec, green(spec.format_type.upper())
+    except IngestError:
+        return {}, red("Unknown")
 
 def green(message) -> str:
     return ":green[" + message + "]"
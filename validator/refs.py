@@ -0,0 +1,167 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+def escape_pointer(token: str) -> str:
+    return token.replace('~', '~0').replace('/', '~1')
+
+def unescape_pointer(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+class RefResolver:
+    """Resolves local $refs of one spec.
+
+    The components/* index is built once; every other lookup and chain is memoized,
+    so a spec pays for resolution once however many rules need it.
+    """
+
+    def __init__(self, api_spec: Any):
+        self.api_spec = api_spec
+        self.index: dict[str, Any] = {}
+        components = api_spec.get('components') if isinstance(api_spec, dict) else None
+        if isinstance(components, dict):
+            for kind, entries in components.items():
+                if isinstance(entries, dict):
+                    for name, node in entries.items():
+                        self.index[f"#/components/{escape_pointer(str(kind))}/{escape_pointer(str(name))}"] = node
+        self._lock = threading.Lock()
+        self._chains: dict[str, tuple] = {}
+        self._refs: Optional[list[tuple[str, str]]] = None
+
+    def resolve(self, ref: str) -> Any:
+        """The node a local ref points at, without following further refs; None if it does not exist."""
+        if ref in self.index:
+            return self.index[ref]
+        if not ref.startswith('#'):
+            return None  # Remote and relative-file refs are not fetched
+        node = self.api_spec
+        for token in ref[1:].split('/')[1:]:
+            token = unescape_pointer(token)
+            if isinstance(node, dict) and token in node:
+                node = node[token]
+            elif isinstance(node, list) and token.isdigit() and int(token) < len(node):
+                node = node[int(token)]
+            else:
+                return None
+        with self._lock:
+            self.index[ref] = node
+        return node
+
+    def chain(self, ref: str) -> tuple:
+        """Follows ref through any refs it points at; returns (node, error), node being None on error."""
+        if ref in self._chains:
+            return self._chains[ref]
+        seen = []
+        node: Any = {'$ref': ref}
+        result = None
+        while isinstance(node, dict) and isinstance(node.get('$ref'), str):
+            current = node['$ref']
+            if current in seen:
+                result = (None, f"circular $ref chain {' -> '.join(seen + [current])}")
+                break
+            seen.append(current)
+            node = self.resolve(current)
+            if node is None:
+                result = (None, f"$ref '{current}' cannot be resolved")
+                break
+        if result is None:
+            result = (node, None)
+        with self._lock:
+            self._chains[ref] = result
+        return result
+
+    def deref(self, node: Any) -> Any:
+        """The node itself, or what its $ref chain leads to; unresolvable refs are returned unchanged."""
+        if isinstance(node, dict) and isinstance(node.get('$ref'), str):
+            target, error = self.chain(node['$ref'])
+            return node if error else target
+        return node
+
+    def components(self, node: Any) -> set[tuple[str, str]]:
+        """(kind, name) of every component node refers to, directly or through other components."""
+        found: set[tuple[str, str]] = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, dict):
+                ref = current.get('$ref')
+                if isinstance(ref, str) and ref.startswith('#/components/'):
+                    tokens = ref[len('#/components/'):].split('/')
+                    if len(tokens) >= 2:
+                        key = (unescape_pointer(tokens[0]), unescape_pointer(tokens[1]))
+                        if key not in found:
+                            found.add(key)
+                            stack.append(self.resolve(f"#/components/{tokens[0]}/{tokens[1]}"))
+                stack.extend(current.values())
+            elif isinstance(current, list):
+                stack.extend(current)
+        return found
+
+    def select(self, keys) -> dict:
+        """The spec's components section cut down to the given (kind, name) entries."""
+        components = self.api_spec.get('components') if isinstance(self.api_spec, dict) else None
+        selected: dict = {}
+        if isinstance(components, dict):
+            for kind, name in sorted(keys):
+                entries = components.get(kind)
+                if isinstance(entries, dict) and name in entries:
+                    selected.setdefault(kind, {})[name] = entries[name]
+        return selected
+
+    def refs(self) -> list[tuple[str, str]]:
+        """Every (JSON pointer, $ref) in the spec."""
+        if self._refs is None:
+            found = []
+            stack = [(self.api_spec, '')]
+            while stack:
+                node, pointer = stack.pop()
+                if isinstance(node, dict):
+                    if isinstance(node.get('$ref'), str):
+                        found.append((pointer or '/', node['$ref']))
+                    stack.extend((v, pointer + '/' + escape_pointer(str(k))) for k, v in node.items())
+                elif isinstance(node, list):
+                    stack.extend((v, pointer + '/' + str(i)) for i, v in enumerate(node))
+            self._refs = sorted(found)
+        return self._refs
+
+    def errors(self) -> list[tuple[str, str]]:
+        """(JSON pointer, message) for every local $ref that is broken or circular."""
+        return [
+            (pointer, error)
+            for pointer, ref in self.refs()
+            if ref.startswith('#')
+            for node, error in [self.chain(ref)]
+            if error
+        ]
+
+# Resolvers of the specs in use by the validation running in this context, by spec object id
+_scope: ContextVar[Optional[dict]] = ContextVar("resolver_scope", default=None)
+
+@contextmanager
+def resolver_scope():
+    """Shares one resolver per spec among everything run inside the block, and drops them after it.
+
+    Scopes follow the context, so they reach coroutines and asyncio.to_thread calls started inside.
+    """
+    if _scope.get() is not None:
+        yield
+        return
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+def get_resolver(api_spec: Any) -> RefResolver:
+    resolvers = _scope.get()
+    if resolvers is None:
+        return RefResolver(api_spec)
+    # The scope holds the spec itself, so its id cannot be reused while the scope lasts
+    resolver = resolvers.get(id(api_spec))
+    if resolver is None:
+        resolver = resolvers.setdefault(id(api_spec), RefResolver(api_spec))
+    return resolver
+
+def deref(api_spec: Any, node: Any) -> Any:
+    return get_resolver(api_spec).deref(node)
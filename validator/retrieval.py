@@ -0,0 +1,56 @@
+import math
+import os
+import re
+from collections import Counter
+
+# BM25 term frequency saturation and length normalisation
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion damping; 60 is the usual choice and rarely worth tuning
+RRF_K = 60
+# Each retriever proposes this many times the number of chunks wanted before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "4"))
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN.findall(text.lower())
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of texts, with an inverted index so a query only touches its terms' postings."""
+
+    def __init__(self, texts: list[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths: list[int] = []
+        for doc, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, []).append((doc, tf))
+        count = len(self.lengths)
+        self.average_length = (sum(self.lengths) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """(position, score) of the k best matching texts, best first."""
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc] / (self.average_length or 1))
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int, constant: int = RRF_K) -> list[int]:
+    """Fuses ranked lists of positions into one, favouring items ranked high by several lists."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc] = scores.get(doc, 0.0) + 1.0 / (constant + rank + 1)
+    return [doc for doc, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]]
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+from typing import Any, Optional
+
+import yaml
+
+from .cache import canonical_json
+from .checkers import CHECKERS
+from .openapi_standard import CompiledSchema
+from .slicing import SLICERS
+
+RULEBOOK_DIR = os.path.dirname(os.path.abspath(__file__))
+RULEBOOK_SCHEMA = CompiledSchema(os.path.join(RULEBOOK_DIR, "rulebook_schema.json"))
+
+# Rulebook used when a request names none
+DEFAULT_RULEBOOK = os.getenv("GOVERNANCE_RULEBOOK", "api_standards_and_governance")
+# Further rulebooks as name=path pairs separated by os.pathsep, e.g. internal=/etc/rules/internal.yaml
+RULEBOOK_PATHS = os.getenv("GOVERNANCE_RULEBOOK_PATHS", "")
+
+class RulebookError(ValueError):
+    """Raised for an unknown rulebook or one that does not match the rulebook schema."""
+
+class Frozen:
+    # Slotted and read-only once built; rulebooks are shared by every request and thread
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _init(self, **fields) -> None:
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+class ASGSectionRule(Frozen):
+    __slots__ = ('id', 'section_id', 'section_name', 'rule', 'humanReview', 'slice', 'checker', 'checkerDecides',
+                 'text', 'prompt_line', 'fingerprint')
+
+    def __init__(self, id: str, section_id: str, section_name: str, rule: str, humanReview: bool,
+                 slice: tuple = (), checker: str = None, checkerDecides: bool = True):
+        self._init(
+            id=id, section_id=section_id, section_name=section_name, rule=rule, humanReview=humanReview,
+            slice=tuple(slice), checker=checker, checkerDecides=checkerDecides,
+            # What the verdict cache keys a rule by
+            text=f"{section_name}\n{rule}",
+            # The rule's line in a batched prompt
+            prompt_line=f"[{id}] \"{section_name}\": {rule}",
+            # Changes with anything that changes the rule's verdict, but not with edits to other rules
+            fingerprint=hashlib.sha256(
+                canonical_json([section_name, rule, humanReview, list(slice), checker, checkerDecides]).encode("utf-8")
+            ).hexdigest()[:16],
+        )
+
+class ASGSection(Frozen):
+    __slots__ = ('id', 'name', 'rules')
+
+    def __init__(self, id: str, name: str, rules: tuple):
+        self._init(id=id, name=name, rules=tuple(rules))
+
+class ASG(Frozen):
+    # Verdicts are kept per rule by ASGSectionRule.fingerprint, so editing one rule does not discard the others
+    __slots__ = ('key', 'name', 'sections', 'rules')
+
+    def __init__(self, key: str, name: str, sections: tuple):
+        self._init(
+            key=key, name=name, sections=tuple(sections),
+            rules=tuple(rule for section in sections for rule in section.rules),
+        )
+
+def build_rulebook(key: str, data: dict) -> ASG:
+    """Checks parsed rulebook YAML against the schema and the known slicers and checkers, and builds it."""
+    problems = [f"{pointer}: {message}" for pointer, message in RULEBOOK_SCHEMA.iter_errors(data)]
+    if problems:
+        raise RulebookError(f"Rulebook {key} is invalid: " + "; ".join(problems[:20]))
+
+    sections = []
+    seen: set[str] = set()
+    for section in data['sections']:
+        section_id = str(section['id'])
+        if section_id in seen:
+            problems.append(f"section {section_id} is defined twice")
+        seen.add(section_id)
+        rules = []
+        for n, rule in enumerate(section['rules'], start=1):
+            for name in rule.get('slice') or []:
+                if name != 'full' and name not in SLICERS:
+                    problems.append(f"rule {section_id}.{n} uses unknown slice {name}")
+            if rule.get('checker') and rule['checker'] not in CHECKERS:
+                problems.append(f"rule {section_id}.{n} uses unknown checker {rule['checker']}")
+            rules.append(ASGSectionRule(
+                f"{section_id}.{n}", section_id, section['name'], rule['rule'], rule['humanReview'],
+                rule.get('slice') or (), rule.get('checker'), rule.get('checkerDecides', True)
+            ))
+        sections.append(ASGSection(section_id, section['name'], rules))
+    if problems:
+        raise RulebookError(f"Rulebook {key} is invalid: " + "; ".join(problems[:20]))
+    return ASG(key, data['name'], sections)
+
+class RulebookRegistry:
+    """Named rulebooks, each parsed and checked once and reloaded whenever its file changes."""
+
+    def __init__(self, paths: dict[str, str]):
+        self.paths = dict(paths)
+        self._lock = threading.Lock()
+        self._loaded: dict[str, tuple[int, ASG]] = {}
+
+    def register(self, name: str, path: str) -> None:
+        with self._lock:
+            self.paths[name] = path
+            self._loaded.pop(name, None)
+
+    def names(self) -> list[str]:
+        return list(self.paths)
+
+    def get(self, name: Optional[str] = None) -> ASG:
+        name = name or DEFAULT_RULEBOOK
+        path = self.paths.get(name)
+        if path is None:
+            raise RulebookError(f"Unknown rulebook {name}; known rulebooks are {', '.join(self.paths)}")
+        mtime = os.stat(path).st_mtime_ns
+        loaded = self._loaded.get(name)
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None and loaded[0] == mtime:
+                return loaded[1]
+            with open(path, 'r', encoding='utf-8') as f:
+                rulebook = build_rulebook(name, yaml.safe_load(f))
+            self._loaded[name] = (mtime, rulebook)
+            return rulebook
+
+def configured_paths() -> dict[str, str]:
+    paths = {"api_standards_and_governance": os.path.join(RULEBOOK_DIR, "api_standards_and_governance.yaml")}
+    for entry in RULEBOOK_PATHS.split(os.pathsep):
+        if '=' in entry:
+            name, path = entry.split('=', 1)
+            paths[name.strip()] = path.strip()
+    return paths
+
+RULEBOOKS = RulebookRegistry(configured_paths())
+
+def get_rulebook(name: Optional[str] = None) -> ASG:
+    return RULEBOOKS.get(name)
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+RULE_TIMEOUT_SECONDS = float(os.getenv("LLM_RULE_TIMEOUT_SECONDS", "120"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout",
+                    "ClientConnectorError", "ClientOSError", "ServerDisconnectedError", "ClientPayloadError"}
+
+class NotEvaluatedError(Exception):
+    """Raised when a call timed out or ran out of retries."""
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English and JSON
+    return len(text) // 4 + 1
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at capacity per minute."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: int) -> float:
+        # Takes the amount now, going into debt if needed, and returns how long to wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class Slots:
+    """Counting semaphore usable from several event loops in several threads."""
+
+    def __init__(self, size: int):
+        self._free = size
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            # The slot was handed over just as we were cancelled; pass it on. If the hand-over
+            # is still in flight, _grant sees the cancelled future and passes it on instead.
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+            self._free += 1
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+class LLMScheduler:
+    """Process-wide gate in front of the LLM provider: bounded concurrency, rate budgets and retries."""
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = TOKENS_PER_MINUTE, max_retries: int = MAX_RETRIES,
+                 timeout: float = RULE_TIMEOUT_SECONDS):
+        self.slots = Slots(max_in_flight)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: int, span: Any = None) -> T:
+        # span, when given, collects the queue wait, call latency and retries (see telemetry.Span)
+        try:
+            return await asyncio.wait_for(self._run(call, tokens, span), self.timeout)
+        except asyncio.TimeoutError:
+            raise NotEvaluatedError(f"timed out after {self.timeout:g}s")
+
+    async def _run(self, call: Callable[[], Awaitable[T]], tokens: int, span: Any) -> T:
+        attempt = 0
+        waiting = time.perf_counter()
+        while True:
+            await asyncio.sleep(max(self.requests.reserve(1), self.tokens.reserve(tokens)))
+            await self.slots.acquire()
+            started = time.perf_counter()
+            if span is not None:
+                span.queue_wait += started - waiting
+            try:
+                return await call()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    raise NotEvaluatedError(f"gave up after {attempt + 1} attempts: {e}") from e
+                delay = backoff(attempt, retry_after(e))
+            finally:
+                self.slots.release()
+                if span is not None:
+                    span.latency += time.perf_counter() - started
+            attempt += 1
+            if span is not None:
+                span.retries = attempt
+            # Backoff counts as queue wait
+            waiting = time.perf_counter()
+            await asyncio.sleep(delay)
+
+def is_retryable(e: Exception) -> bool:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return status in RETRYABLE_STATUS or type(e).__name__ in RETRYABLE_ERRORS or isinstance(e, asyncio.TimeoutError)
+
+def retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(e, "headers", None) or getattr(getattr(e, "response", None), "headers", None) or {}
+    value: Any = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def backoff(attempt: int, retry_after_seconds: Optional[float], base: float = 1.0, cap: float = 60.0) -> float:
+    # Full jitter, but never earlier than the provider asked for
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, retry_after_seconds or 0.0)
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,77 @@
+"""HTTP service exposing the validators to other systems.
+
+    python -m validator.service --port 8080 [--llm fake]
+
+POST a JSON or YAML spec to one of the endpoints below; the response is the report as JSON.
+Pass ?key=... to name the spec for incremental re-validation and ?rulebook=... to pick a
+governance rulebook other than the default.
+
+    POST /validate/openapi-standard
+    POST /validate/api-standards-and-governance
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+from .api_standards_and_governance import validate_api_spec_async as validate_api_standards_and_governance
+from .ingest import MAX_SPEC_BYTES, IngestError, ingest
+from .llm import BACKENDS, get_llm_backend, set_llm_backend
+from .models import RequestModel
+from .openapi_standard import validate_api_spec as validate_openapi_standard
+from .rulebook import RulebookError
+
+JSON_TYPES = ("application/json", "text/json")
+YAML_TYPES = ("application/yaml", "application/x-yaml", "text/yaml", "text/x-yaml")
+
+async def read_request(request: web.Request) -> RequestModel:
+    body = await request.read()
+    format_type = "json" if request.content_type in JSON_TYPES else "yaml" if request.content_type in YAML_TYPES else None
+    try:
+        spec = await asyncio.get_running_loop().run_in_executor(None, lambda: ingest(body, format_type=format_type))
+    except IngestError as e:
+        raise web.HTTPBadRequest(text=json.dumps({"errors": [str(e)]}), content_type="application/json")
+    return RequestModel(spec.format_type, spec.api_spec, request.query.get("key"), request.query.get("rulebook"))
+
+async def openapi_standard(request: web.Request) -> web.Response:
+    req = await read_request(request)
+    # CPU bound; keep it off the event loop
+    response = await asyncio.get_running_loop().run_in_executor(None, validate_openapi_standard, req)
+    return web.json_response(response.to_dict(), dumps=dumps)
+
+async def api_standards_and_governance(request: web.Request) -> web.Response:
+    req = await read_request(request)
+    try:
+        response = await validate_api_standards_and_governance(req)
+    except RulebookError as e:
+        raise web.HTTPBadRequest(text=json.dumps({"errors": [str(e)]}), content_type="application/json")
+    return web.json_response(response.to_dict(), dumps=dumps)
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "llm": get_llm_backend().name})
+
+def dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+def create_app() -> web.Application:
+    app = web.Application(client_max_size=MAX_SPEC_BYTES)
+    app.router.add_post("/validate/openapi-standard", openapi_standard)
+    app.router.add_post("/validate/api-standards-and-governance", api_standards_and_governance)
+    app.router.add_get("/health", health)
+    return app
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m validator.service", description="Serve the API spec validators over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--llm", choices=sorted(BACKENDS), help="LLM backend; defaults to LLM_BACKEND or openai")
+    args = parser.parse_args(argv)
+
+    if args.llm:
+        set_llm_backend(args.llm)
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from typing import Any, Callable
+
+from .refs import escape_pointer, get_resolver
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+# Each slicer extracts from the spec only what a rule needs to be judged
+SLICERS: dict[str, Callable[[dict], Any]] = {}
+
+# JSON pointer patterns of the spec regions each slicer reads. "*" matches one token and
+# "**" any number of tokens, so a pattern ending in "/**" covers a whole subtree.
+SLICE_REGIONS: dict[str, list[str]] = {}
+
+# Slicers whose extract already holds the definitions its $refs point at
+SELF_CONTAINED: set[str] = set()
+
+def slicer(name: str, regions: list[str], self_contained: bool = False):
+    def register(fn: Callable[[dict], Any]) -> Callable[[dict], Any]:
+        SLICERS[name] = fn
+        SLICE_REGIONS[name] = regions
+        if self_contained:
+            SELF_CONTAINED.add(name)
+        return fn
+    return register
+
+def slice_spec(api_spec: Any, names: list[str]) -> Any:
+    # Rules without a slice, or specs that are not mappings, get the whole spec as before
+    if not names or 'full' in names or not isinstance(api_spec, dict):
+        return api_spec
+    extract = {name: SLICERS[name](api_spec) for name in names}
+    # $refs stay pointers; the components they lead to are added once, however often they are used,
+    # so an extract is never bigger than the parts of the spec it draws on
+    resolver = get_resolver(api_spec)
+    components = resolver.select(referenced_components(api_spec, names, extract))
+    if components:
+        extract['components'] = components
+    return extract
+
+def referenced_components(api_spec: dict, names: list[str], extract: dict = None) -> set[tuple[str, str]]:
+    """(kind, name) of the components slice_spec adds to the extract of the named slices."""
+    extract = extract or {}
+    resolver = get_resolver(api_spec)
+    return resolver.components([
+        extract[name] if name in extract else SLICERS[name](api_spec) for name in names if name not in SELF_CONTAINED
+    ])
+
+def as_dict(node: Any) -> dict:
+    # Malformed specs can put anything where a mapping belongs; such nodes are treated as empty
+    return node if isinstance(node, dict) else {}
+
+def as_list(node: Any) -> list:
+    return node if isinstance(node, list) else []
+
+def iter_operations(api_spec: dict):
+    paths = api_spec.get('paths')
+    if not isinstance(paths, dict):
+        return
+    for path, item in paths.items():
+        if not isinstance(item, dict):
+            continue
+        for method in HTTP_METHODS:
+            operation = item.get(method)
+            if isinstance(operation, dict):
+                yield path, method, item, operation
+
+def iter_parameters(api_spec: dict):
+    # Path-level parameters apply to every operation under the path; referenced ones are resolved,
+    # broken references are yielded as they are
+    resolver = get_resolver(api_spec)
+    for path, method, item, operation in iter_operations(api_spec):
+        for parameter in as_list(item.get('parameters')) + as_list(operation.get('parameters')):
+            parameter = resolver.deref(parameter)
+            if isinstance(parameter, dict):
+                yield path, method, parameter
+
+def iter_schema_properties(node: Any, pointer: str = ''):
+    if isinstance(node, dict):
+        properties = node.get('properties')
+        if isinstance(properties, dict):
+            for name, schema in properties.items():
+                if isinstance(schema, dict):
+                    yield pointer + '/properties/' + escape_pointer(str(name)), name, schema
+        for key, value in node.items():
+            yield from iter_schema_properties(value, pointer + '/' + escape_pointer(str(key)))
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            yield from iter_schema_properties(value, pointer + '/' + str(i))
+
+def compact_parameter(parameter: dict) -> dict:
+    keep = ('$ref', 'name', 'in', 'required', 'description', 'schema', 'example')
+    return {k: parameter[k] for k in keep if k in parameter}
+
+@slicer('info', ['/info', '/info/title', '/info/version', '/info/description'])
+def info_slice(api_spec: dict) -> Any:
+    info = as_dict(api_spec.get('info'))
+    return {k: info[k] for k in ('title', 'version', 'description') if k in info}
+
+@slicer('path_keys', ['/paths', '/paths/*'])
+def path_keys_slice(api_spec: dict) -> Any:
+    paths = api_spec.get('paths')
+    return list(paths.keys()) if isinstance(paths, dict) else []
+
+@slicer('operations', ['/paths', '/paths/*', '/paths/*/*', '/paths/*/*/operationId', '/paths/*/*/summary', '/paths/*/*/description', '/paths/*/*/requestBody', '/paths/*/*/responses', '/paths/*/*/responses/*'])
+def operations_slice(api_spec: dict) -> Any:
+    operations = []
+    for path, method, item, operation in iter_operations(api_spec):
+        operations.append({
+            'path': path,
+            'method': method.upper(),
+            'operationId': operation.get('operationId'),
+            'summary': operation.get('summary') or operation.get('description'),
+            'requestBody': 'requestBody' in operation,
+            'responses': [str(code) for code in as_dict(operation.get('responses'))]
+        })
+    return operations
+
+@slicer('query_parameters', ['/paths', '/paths/*', '/paths/*/*', '/paths/*/parameters/**', '/paths/*/*/parameters/**', '/components/parameters/**', '/components/schemas/**'])
+def query_parameters_slice(api_spec: dict) -> Any:
+    return [
+        dict(compact_parameter(parameter), path=path, method=method.upper())
+        for path, method, parameter in iter_parameters(api_spec)
+        if parameter.get('in') == 'query' or '$ref' in parameter
+    ]
+
+@slicer('header_parameters', ['/paths', '/paths/*', '/paths/*/*', '/paths/*/parameters/**', '/paths/*/*/parameters/**', '/components/parameters/**'])
+def header_parameters_slice(api_spec: dict) -> Any:
+    return sorted({
+        str(parameter['name'])
+        for path, method, parameter in iter_parameters(api_spec)
+        if parameter.get('in') == 'header' and 'name' in parameter
+    })
+
+@slicer('schema_properties', ['/**/properties/**', '/components/schemas/**'], self_contained=True)
+def schema_properties_slice(api_spec: dict) -> Any:
+    # Grouped by the schema declaring them, so each schema's pointer is written once
+    keep = ('$ref', 'type', 'format', 'pattern', 'example', 'description')
+    schemas: dict[str, dict] = {}
+    for pointer, name, schema in iter_schema_properties(api_spec):
+        parent = pointer[:-len('/properties/' + escape_pointer(str(name)))] or '/'
+        schemas.setdefault(parent, {})[str(name)] = {k: schema[k] for k in keep if k in schema}
+    return schemas
+
+@slicer('security_schemes', ['/components', '/components/securitySchemes/**'])
+def security_schemes_slice(api_spec: dict) -> Any:
+    return as_dict(as_dict(api_spec.get('components')).get('securitySchemes'))
+
+@slicer('media_types', ['/paths', '/paths/*', '/paths/*/*', '/paths/*/*/requestBody/**', '/paths/*/*/responses', '/paths/*/*/responses/*', '/paths/*/*/responses/*/content', '/paths/*/*/responses/*/content/*', '/paths/*/*/responses/*/content/*/encoding/**', '/components/requestBodies/**', '/components/responses/**'])
+def media_types_slice(api_spec: dict) -> Any:
+    media_types = []
+    resolver = get_resolver(api_spec)
+    for path, method, item, operation in iter_operations(api_spec):
+        bodies = [('requestBody', operation.get('requestBody') or {})]
+        bodies += [('responses/' + str(code), response) for code, response in as_dict(operation.get('responses')).items()]
+        for where, body in bodies:
+            body = resolver.deref(body)
+            if isinstance(body, dict) and isinstance(body.get('content'), dict):
+                media_types.append({
+                    'path': path,
+                    'method': method.upper(),
+                    'in': where,
+                    'content': {str(k): as_dict(v).get('encoding') for k, v in body['content'].items()}
+                })
+    return media_types
+
+@slicer('responses', ['/paths', '/paths/*', '/paths/*/*', '/paths/*/*/responses/**', '/components/responses/**', '/components/schemas/**', '/components/headers/**', '/components/examples/**'])
+def responses_slice(api_spec: dict) -> Any:
+    return [
+        {'path': path, 'method': method.upper(), 'responses': operation.get('responses')}
+        for path, method, item, operation in iter_operations(api_spec)
+    ]
@@ -0,0 +1,113 @@
+"""Synthetic OpenAPI 3.0 specs of controlled size, for benchmarks and load tests.
+
+    python -m validator.synthetic --paths 1000 --non-compliant > spec.json
+    python -m validator.synthetic --paths 10 --format yaml > spec.yaml
+"""
+import argparse
+import json
+import random
+import sys
+
+import yaml
+
+class NoAliasDumper(yaml.SafeDumper):
+    # Operations share response objects; write each out in full rather than as anchors
+    def ignore_aliases(self, data) -> bool:
+        return True
+
+def generate_spec(paths: int = 100, ref_depth: int = 8, properties: int = 20, schemas: int = 50, compliant: bool = True, seed: int = 0) -> dict:
+    """A structurally valid spec with the given number of paths.
+
+    Every schema reaches the end of a $ref chain ref_depth levels deep, half through plain alias
+    refs and half through nested properties. Non-compliant specs keep the structure valid but break
+    governance rules: snake_case paths and query parameters, NRIC path parameters, dates without
+    a format, GET with a request body and operationIds that contradict their method.
+    Response codes are int keys, as YAML loads them when they are written unquoted.
+    """
+    rng = random.Random(seed)
+    schemas = max(1, schemas)
+    components: dict = {"schemas": {}, "parameters": {}}
+
+    # Level0 -> Level1 -> ... nested through properties; Alias0 -> ... -> Level0 as a bare chain
+    for level in range(ref_depth):
+        schema: dict = {"type": "object", "properties": {"value": {"type": "string"}}}
+        if level + 1 < ref_depth:
+            schema["properties"]["child"] = {"$ref": f"#/components/schemas/Level{level + 1}"}
+        components["schemas"][f"Level{level}"] = schema
+        target = f"Alias{level + 1}" if level + 1 < ref_depth else "Level0"
+        components["schemas"][f"Alias{level}"] = {"$ref": f"#/components/schemas/{target}"}
+
+    for i in range(schemas):
+        props: dict = {"id": {"type": "string", "format": "uuid"}}
+        if compliant:
+            props["createdDate"] = {"type": "string", "format": "date-time"}
+        else:
+            props["created_date"] = {"type": "string"}
+        for p in range(properties):
+            kind = rng.choice(("string", "integer", "boolean", "number"))
+            props[f"field{p}" if compliant else f"field_{p}"] = {"type": kind, "description": f"Field {p} of resource {i}."}
+        if ref_depth:
+            props["detail"] = {"$ref": f"#/components/schemas/{'Alias0' if i % 2 else 'Level0'}"}
+        components["schemas"][f"Resource{i}"] = {"type": "object", "required": ["id"], "properties": props}
+
+    components["parameters"]["PageSize"] = {
+        "name": "pageSize" if compliant else "page_size",
+        "in": "query",
+        "schema": {"type": "integer", "minimum": 1, "maximum": 100},
+    }
+
+    spec_paths: dict = {}
+    for i in range(paths):
+        resource = f"#/components/schemas/Resource{i % schemas}"
+        collection = f"/resources-{i}" if compliant else f"/Resources_{i}"
+        identifier = "resourceId" if compliant else "nric"
+        ok = {"description": "OK", "content": {"application/json": {"schema": {"$ref": resource}}}}
+        spec_paths[collection] = {
+            "get": {
+                "operationId": f"listResources{i}",
+                "summary": f"List resources {i}.",
+                "parameters": [{"$ref": "#/components/parameters/PageSize"}],
+                "responses": {200: {"description": "OK", "content": {"application/json": {"schema": {"type": "array", "items": {"$ref": resource}}}}}},
+            },
+            "post": {
+                "operationId": f"createResource{i}" if compliant else f"deleteResource{i}",
+                "requestBody": {"required": True, "content": {"application/json": {"schema": {"$ref": resource}}}},
+                "responses": {201: ok},
+            },
+        }
+        item: dict = {
+            "parameters": [{"name": identifier, "in": "path", "required": True, "schema": {"type": "string"}}],
+            "get": {"operationId": f"getResource{i}", "responses": {200: ok, 404: {"description": "Not found"}}},
+            "delete": {"operationId": f"deleteResource{i}", "responses": {204: {"description": "Deleted"}}},
+        }
+        if not compliant:
+            item["get"]["requestBody"] = {"content": {"application/json": {"schema": {"type": "object"}}}}
+        spec_paths[f"{collection}/{{{identifier}}}"] = item
+
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": f"Synthetic API {paths}", "version": "1.0.0", "description": "Generated for benchmarking."},
+        "paths": spec_paths,
+        "components": components,
+    }
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m validator.synthetic", description="Print a synthetic OpenAPI spec as JSON or YAML.")
+    parser.add_argument("--paths", type=int, default=100)
+    parser.add_argument("--ref-depth", type=int, default=8)
+    parser.add_argument("--properties", type=int, default=20)
+    parser.add_argument("--schemas", type=int, default=50)
+    parser.add_argument("--non-compliant", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=("json", "yaml"), default="json")
+    args = parser.parse_args(argv)
+    spec = generate_spec(args.paths, args.ref_depth, args.properties, args.schemas, not args.non_compliant, args.seed)
+    if args.format == "yaml":
+        # Unquoted response codes, the way they are usually written
+        yaml.dump(spec, sys.stdout, Dumper=NoAliasDumper, sort_keys=False)
+    else:
+        json.dump(spec, sys.stdout, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# JSON Lines file every finished span is appended to; unset to keep spans in the report only
+TRACE_SINK_PATH = os.getenv("TRACE_SINK_PATH", "")
+
+# USD per million input and output tokens
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-ada-002": (0.10, 0.0),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+# Input tokens served from the provider's prompt cache are billed at this share of the input price
+CACHED_INPUT_PRICE_RATIO = 0.5
+
+_call_ids = itertools.count(1)
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    # Offline backends prefix the model, e.g. fake:gpt-4o-mini; they are priced as the real model
+    prices = MODEL_PRICES.get(model.split(":")[-1])
+    if prices is None:
+        return None
+    cached = min(cached_tokens, input_tokens)
+    return ((input_tokens - cached + cached * CACHED_INPUT_PRICE_RATIO) * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+class Span:
+    """Timing, token and cost figures of one LLM call, or of a rule answered without one."""
+
+    def __init__(self, name: str, model: str = "", rule_id: str = None, source: str = "llm", batch_size: int = 1):
+        self.call_id = next(_call_ids)
+        self.name = name
+        self.model = model
+        self.rule_id = rule_id
+        # llm, cache, carried, checker or human
+        self.source = source
+        self.batch_size = batch_size
+        # Calls made for the rule when an oversized spec was split into chunks
+        self.chunks = 1
+        self.started = time.time()
+        # Waiting for rate budgets, a free slot or a retry backoff
+        self.queue_wait = 0.0
+        # Inside provider calls, all attempts together
+        self.latency = 0.0
+        # Until the first piece of a streamed reply arrived
+        self.first_token: Optional[float] = None
+        self.input_tokens = 0
+        # Part of the input the provider served from its prompt cache
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.retries = 0
+        self.cache_hit = source in ("cache", "carried")
+        self.cost_usd: Optional[float] = 0.0 if source != "llm" else None
+        self.error: Optional[str] = None
+
+    def record_usage(self, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> None:
+        self.input_tokens = input_tokens
+        self.cached_tokens = cached_tokens
+        self.output_tokens = output_tokens
+        self.cost_usd = estimate_cost(self.model, input_tokens, output_tokens, cached_tokens)
+
+    def share(self, rule_id: str, batch_size: int) -> "Span":
+        # A rule's part of a batched call: same timings, an even share of its tokens and cost
+        span = Span(self.name, self.model, rule_id, self.source, batch_size)
+        span.call_id = self.call_id
+        span.started, span.queue_wait, span.latency, span.retries, span.error = self.started, self.queue_wait, self.latency, self.retries, self.error
+        span.input_tokens = self.input_tokens // batch_size
+        span.cached_tokens = self.cached_tokens // batch_size
+        span.output_tokens = self.output_tokens // batch_size
+        span.cost_usd = self.cost_usd / batch_size if self.cost_usd is not None else None
+        return span
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name, 'model': self.model, 'rule_id': self.rule_id, 'source': self.source,
+            'batch_size': self.batch_size, 'chunks': self.chunks, 'started': round(self.started, 3),
+            'queue_wait': round(self.queue_wait, 4), 'latency': round(self.latency, 4),
+            'first_token': round(self.first_token, 4) if self.first_token is not None else None,
+            'input_tokens': self.input_tokens, 'cached_tokens': self.cached_tokens, 'output_tokens': self.output_tokens, 'retries': self.retries,
+            'cache_hit': self.cache_hit,
+            'cost_usd': round(self.cost_usd, 6) if self.cost_usd is not None else None,
+            'error': self.error,
+        }
+
+def combine(name: str, model: str, rule_id: str, parts: list[Span]) -> Span:
+    # Parallel calls for one rule: the slowest call's timings, everything else added up
+    span = Span(name, model, rule_id)
+    span.chunks = len(parts)
+    span.queue_wait = max((p.queue_wait for p in parts), default=0.0)
+    span.latency = max((p.latency for p in parts), default=0.0)
+    span.input_tokens = sum(p.input_tokens for p in parts)
+    span.cached_tokens = sum(p.cached_tokens for p in parts)
+    span.output_tokens = sum(p.output_tokens for p in parts)
+    span.retries = sum(p.retries for p in parts)
+    costs = [p.cost_usd for p in parts if p.cost_usd is not None]
+    span.cost_usd = sum(costs) if costs else None
+    return span
+
+def summarize(spans: list[Span], wall_seconds: float) -> dict:
+    # Rules of one batch share a call
+    calls = {span.call_id: span for span in spans if span.source == "llm"}
+    costs = [s.cost_usd for s in spans if s.cost_usd is not None]
+    return {
+        'wall_seconds': round(wall_seconds, 4),
+        'llm_calls': sum(s.chunks for s in calls.values()),
+        'queue_wait': round(sum(s.queue_wait for s in calls.values()), 4),
+        'latency': round(sum(s.latency for s in calls.values()), 4),
+        'input_tokens': sum(s.input_tokens for s in spans),
+        'cached_tokens': sum(s.cached_tokens for s in spans),
+        'output_tokens': sum(s.output_tokens for s in spans),
+        'retries': sum(s.retries for s in calls.values()),
+        'cache_hits': sum(1 for s in spans if s.cache_hit),
+        'cost_usd': round(sum(costs), 6) if costs else None,
+    }
+
+class TraceSink:
+    """Appends spans as JSON Lines to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: list[Span], **context) -> None:
+        lines = ''.join(json.dumps(dict(span.to_dict(), **context), ensure_ascii=False) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+_sink: Optional[TraceSink] = None
+_sink_lock = threading.Lock()
+
+def export_spans(spans: list[Span], **context) -> None:
+    global _sink
+    if not TRACE_SINK_PATH or not spans:
+        return
+    with _sink_lock:
+        if _sink is None:
+            _sink = TraceSink(TRACE_SINK_PATH)
+    _sink.export(spans, **context)
+
+@contextmanager
+def span(name: str, model: str = "", **context) -> Iterator[Span]:
+    """Times the block as a single call and exports it; set the token counts inside the block."""
+    s = Span(name, model)
+    started = time.perf_counter()
+    try:
+        yield s
+    except Exception as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.latency = time.perf_counter() - started
+        if s.cost_usd is None:
+            s.cost_usd = estimate_cost(model, s.input_tokens, s.output_tokens)
+        export_spans([s], **context)
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Optional
+
+import faiss
+import numpy as np
+
+# One directory per published version plus a CURRENT file naming the live one
+INDEX_DIR = os.getenv("GUIDANCE_INDEX_DIR", "./.cache/guidance-index")
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.json"
+KEEP_VERSIONS = 2
+
+def fingerprint(texts: list[str], model: str) -> str:
+    digest = hashlib.sha256(model.encode("utf-8"))
+    for text in texts:
+        digest.update(b"\x1e" + text.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+class NativeIndexStore:
+    """FAISS vectors in FAISS's own format with the chunk texts beside them as a JSON list.
+
+    Versions are written to a scratch directory, renamed into place and then made current by
+    atomically replacing CURRENT, so readers in any process see either the old or the new index.
+    """
+
+    def __init__(self, directory: str = INDEX_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def has(self, version: str) -> bool:
+        return os.path.exists(os.path.join(self.directory, version, DOCSTORE_FILE))
+
+    def publish(self, version: str, vectors: Any = None, texts: list[str] = None) -> None:
+        """Makes version current, writing it first unless it already exists."""
+        if not self.has(version):
+            scratch = tempfile.mkdtemp(prefix=".build-", dir=self.directory)
+            try:
+                matrix = np.ascontiguousarray(np.asarray(vectors, dtype="float32"))
+                index = faiss.IndexFlatL2(matrix.shape[1])
+                index.add(matrix)
+                faiss.write_index(index, os.path.join(scratch, INDEX_FILE))
+                with open(os.path.join(scratch, DOCSTORE_FILE), "w", encoding="utf-8") as f:
+                    json.dump(texts, f, ensure_ascii=False, separators=(",", ":"))
+                os.rename(scratch, os.path.join(self.directory, version))
+            except OSError:
+                # Another process published the same version first
+                shutil.rmtree(scratch, ignore_errors=True)
+                if not self.has(version):
+                    raise
+        pointer = os.path.join(self.directory, f".CURRENT-{os.getpid()}-{threading.get_ident()}")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(self.directory, "CURRENT"))
+        self.prune(version)
+
+    def load(self, version: str) -> tuple[Any, list[str]]:
+        path = os.path.join(self.directory, version, INDEX_FILE)
+        # Memory-mapped, the vectors stay in the page cache shared by every process that loads them.
+        # FAISS before 1.11 cannot map flat indexes and reads them into memory instead.
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            index = faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(path, faiss.IO_FLAG_READ_ONLY)
+        with open(os.path.join(self.directory, version, DOCSTORE_FILE), encoding="utf-8") as f:
+            texts = json.load(f)
+        return index, texts
+
+    def prune(self, keep: str) -> None:
+        # Older versions may still be mapped by other processes; unlinking them is safe on POSIX
+        versions = sorted(
+            (e for e in os.scandir(self.directory) if e.is_dir() and not e.name.startswith(".")),
+            key=lambda e: e.stat().st_mtime, reverse=True
+        )
+        for entry in [e for e in versions if e.name != keep][KEEP_VERSIONS - 1:]:
+            shutil.rmtree(entry.path, ignore_errors=True)